@@ -0,0 +1,241 @@
+# array_engine.py - NumPy-backed numeric kernels behind the list tools
+
+import math
+from decimal import Decimal, localcontext, MAX_EMAX, MIN_EMIN, ROUND_FLOOR
+from fractions import Fraction
+
+import numpy as np
+
+import packed
+
+EXP_SUM_MODES = ("auto", "log", "exact")
+
+REDUCTIONS = ("sum", "prod", "mean", "var", "min", "max", "cumsum", "dot")
+
+_INT64_MAX = np.iinfo(np.int64).max
+
+# Vectorized counterparts of the unary math tools
+UFUNCS = {
+    "sqrt": np.sqrt,
+    "cbrt": np.cbrt,
+    "log": np.log,
+    "sin": np.sin,
+    "cos": np.cos,
+    "tan": np.tan,
+    "exp": np.exp,
+}
+
+# Largest precision (significant digits) accepted by exponential_sum(mode="exact")
+MAX_EXACT_PRECISION = 10_000
+
+# exp(x) overflows a float64 above this
+_LOG_FLOAT_MAX = math.log(np.finfo(np.float64).max)
+
+# exp(x) overflows the decimal module's exponent range above roughly this
+_DECIMAL_EXP_MAX = 1e17
+
+
+def shifted_exp_sum(values: np.ndarray) -> tuple[float, float]:
+    """(peak, s) with sum(exp(values)) == exp(peak) * s and 1 <= s <= len(values)."""
+    peak = float(values.max())
+    if not math.isfinite(peak):
+        return peak, 1.0
+    return peak, float(np.exp(values - peak).sum())
+
+def exponential_sum(values, mode: str = "auto", precision: int = 50):
+    """sum(exp(v) for v in values), vectorized.
+
+    mode "auto" returns a float, or {"mantissa", "exponent", "log"} (value =
+    mantissa * 10**exponent) once the sum overflows a float; "log" returns
+    the natural log of the sum; "exact" returns a decimal string with
+    precision significant digits.
+    """
+    if mode not in EXP_SUM_MODES:
+        raise ValueError(f"Unknown mode: {mode} (expected one of {', '.join(EXP_SUM_MODES)})")
+    if mode == "exact":
+        return _exact_exponential_sum(values, precision)
+
+    array = to_array(values).astype(np.float64)
+    if array.size == 0:
+        if mode == "log":
+            raise ValueError("log of an empty exponential sum is undefined")
+        return 0.0
+    if mode == "auto" and array.max() < _LOG_FLOAT_MAX:
+        total = float(np.exp(array).sum())
+        if math.isfinite(total):
+            return total
+
+    peak, scaled = shifted_exp_sum(array)
+    if not math.isfinite(peak):
+        raise ValueError("values must be finite")
+    log_total = peak + math.log(scaled)
+    if mode == "log":
+        return log_total
+    if peak < _DECIMAL_EXP_MAX:
+        # one decimal exp of the peak keeps the mantissa at full float precision
+        with localcontext(prec=30, Emax=MAX_EMAX, Emin=MIN_EMIN):
+            total = Decimal(peak).exp() * Decimal(scaled)
+            mantissa, exponent = float(total.scaleb(-total.adjusted())), total.adjusted()
+    else:
+        # a float log10 this large has no fractional digits left, so the
+        # mantissa comes from a decimal log carrying the peak's integer digits
+        with localcontext(prec=30 + len(str(int(peak)))):
+            log10_total = (Decimal(peak) + Decimal(scaled).ln()) / Decimal(10).ln()
+            exponent = int(log10_total.to_integral_value(rounding=ROUND_FLOOR))
+            mantissa = float(Decimal(10) ** (log10_total - exponent))
+    return {"mantissa": mantissa, "exponent": exponent, "log": log_total}
+
+def _exact_exponential_sum(values, precision: int) -> str:
+    if not 1 <= precision <= MAX_EXACT_PRECISION:
+        raise ValueError(f"precision must be between 1 and {MAX_EXACT_PRECISION}")
+    if packed.is_packed(values):
+        values = packed.unpack_array(values).tolist()
+    # guard digits absorb the rounding of each term before the final round
+    guard = len(str(len(values))) + 5
+    with localcontext(prec=precision + guard, Emax=MAX_EMAX, Emin=MIN_EMIN) as ctx:
+        total = sum((Decimal(v).exp() for v in values), Decimal(0))
+        ctx.prec = precision
+        return str(+total)
+
+
+# ------------------------------------------------
+# REDUCTIONS
+# ------------------------------------------------
+def to_array(values) -> np.ndarray:
+    """Convert a list of numbers, or a packed array, to a 1-D array once.
+
+    Integers stay exact: int64 when they fit, otherwise an object array of
+    Python ints. Floats become float64. Packed arrays are decoded with
+    np.frombuffer and keep their dtype.
+    """
+    if packed.is_packed(values):
+        array = packed.unpack_array(values)
+    elif len(values) == 0:
+        return np.zeros(0, dtype=np.int64)
+    else:
+        array = np.asarray(values)
+    if array.ndim != 1:
+        raise ValueError("values must be a flat list of numbers")
+    if array.dtype.kind == "b":
+        return array.astype(np.int64)
+    if array.dtype.kind == "O":
+        if not all(isinstance(v, (int, float)) and not isinstance(v, bool) for v in array):
+            raise ValueError("values must be numbers")
+        return array
+    if array.dtype.kind not in "iuf":
+        raise ValueError("values must be numbers")
+    if array.dtype.kind == "u":
+        return array.astype(np.int64) if array.size == 0 or array.max() <= _INT64_MAX else array.astype(object)
+    if array.dtype.kind == "i" and array.dtype.itemsize < 8:
+        return array.astype(np.int64)
+    return array
+
+def _magnitude(array: np.ndarray) -> int:
+    """Largest |v| in an integer array, as a Python int."""
+    if array.size == 0:
+        return 0
+    return max(abs(int(array.max())), abs(int(array.min())))
+
+def _exact_ints(array: np.ndarray, bound: int) -> np.ndarray:
+    """Promote an int64 array to Python ints when a result could reach bound."""
+    if array.dtype.kind == "i" and bound > _INT64_MAX:
+        return array.astype(object)
+    return array
+
+def _scalar(value):
+    return value.item() if isinstance(value, np.generic) else value
+
+def reduce_array(op: str, values, other=None, encoding: str = "list"):
+    """Apply one reduction to values (and other, for dot). Integer sums,
+    products and dot products are exact, falling back to Python ints before
+    int64 could overflow. encoding applies to the cumsum array result."""
+    if op not in REDUCTIONS:
+        raise ValueError(f"Unknown op: {op} (expected one of {', '.join(REDUCTIONS)})")
+    array = to_array(values)
+    n = array.size
+
+    if op in ("sum", "cumsum"):
+        if array.dtype.kind == "i":
+            array = _exact_ints(array, n * _magnitude(array))
+        result = np.sum(array) if op == "sum" else np.cumsum(array)
+        return _scalar(result) if op == "sum" else packed.encode_array(result, encoding)
+    if op == "prod":
+        if array.dtype.kind == "i":
+            magnitude = _magnitude(array)
+            if magnitude > 1 and n * math.log2(magnitude) >= 63:
+                array = array.astype(object)
+        return _scalar(np.prod(array)) if n else 1
+    if op == "dot":
+        if other is None:
+            raise ValueError("dot requires a second list in other")
+        second = to_array(other)
+        if second.size != n:
+            raise ValueError(f"dot requires lists of equal length ({n} != {second.size})")
+        if array.dtype.kind == "i" and second.dtype.kind == "i":
+            bound = n * _magnitude(array) * _magnitude(second)
+            array, second = _exact_ints(array, bound), _exact_ints(second, bound)
+        return _scalar(np.dot(array, second)) if n else 0
+
+    if n == 0:
+        raise ValueError(f"{op} requires at least one value")
+    if op == "min":
+        return _scalar(np.min(array))
+    if op == "max":
+        return _scalar(np.max(array))
+    if array.dtype.kind == "O":
+        return _exact_moment(op, array)
+    floats = array.astype(np.float64)
+    return float(np.mean(floats) if op == "mean" else np.var(floats))
+
+def _exact_moment(op: str, array: np.ndarray) -> float:
+    """mean / var of an object array of Python numbers, which may be beyond
+    float64 range, computed in fractions and rounded once at the end."""
+    values = [Fraction(v) for v in array]
+    mean = sum(values, Fraction(0)) / len(values)
+    result = mean if op == "mean" else sum(((v - mean) ** 2 for v in values), Fraction(0)) / len(values)
+    try:
+        return float(result)
+    except OverflowError:
+        raise ValueError(f"{op} of these values is too large for a float") from None
+
+
+# ------------------------------------------------
+# ELEMENTWISE
+# ------------------------------------------------
+def apply_elementwise(op: str, values, scalar_ops: dict | None = None, encoding: str = "list"):
+    """op applied to every value.
+
+    Ops in UFUNCS run as one vectorized float64 pass; ops in scalar_ops
+    (name -> function, e.g. big-int factorial) loop in Python. Elements whose
+    result is undefined or not finite (log(0), sqrt(-1), a failing scalar
+    call) come back as None, or as NaN with encoding="packed".
+    """
+    scalar_ops = scalar_ops or {}
+    if op in scalar_ops:
+        if encoding != "list":
+            raise ValueError(f"{op} results are exact integers; use encoding='list'")
+        if packed.is_packed(values):
+            values = packed.unpack_array(values).tolist()
+        fn = scalar_ops[op]
+        results = []
+        for value in values:
+            try:
+                results.append(fn(value))
+            except (ArithmeticError, ValueError, TypeError):
+                results.append(None)
+        return results
+    ufunc = UFUNCS.get(op)
+    if ufunc is None:
+        raise ValueError(f"Unknown op: {op} (expected one of {', '.join([*UFUNCS, *scalar_ops])})")
+
+    array = to_array(values).astype(np.float64)
+    with np.errstate(all="ignore"):
+        result = ufunc(array)
+    if encoding != "list":
+        return packed.encode_array(np.where(np.isfinite(result), result, np.nan), encoding)
+    finite = np.isfinite(result)
+    if finite.all():
+        return result.tolist()
+    result = result.astype(object)
+    result[~finite] = None
+    return result.tolist()
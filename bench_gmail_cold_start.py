@@ -0,0 +1,128 @@
+# bench_gmail_cold_start.py - Gmail server cold start against a local stand-in for the Gmail API
+#
+# Spawns gmail_mcp_server.py over stdio in a scratch directory holding a fake
+# (unexpired) token.json, with GMAIL_API_ENDPOINT pointing at a local HTTP
+# server that answers getProfile and messages.send after a simulated round
+# trip. Times the initialize handshake and the first email's delivery
+# (send_email queues it; get_send_status is polled until it is sent), with
+# the discovery / profile caches cleared ("cold") and kept ("warm").
+#
+# Usage: python bench_gmail_cold_start.py [runs] [latency_ms]
+#   python bench_gmail_cold_start.py          # 5 runs each, 100 ms per API request
+
+import asyncio
+import json
+import os
+import re
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from mcp import ClientSession, StdioServerParameters
+from mcp.client.stdio import stdio_client
+
+SERVER_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "gmail_mcp_server.py")
+
+FAKE_TOKEN = {
+    "token": "stand-in-access-token",
+    "refresh_token": "stand-in-refresh-token",
+    "client_id": "stand-in.apps.googleusercontent.com",
+    "client_secret": "stand-in-secret",
+    "token_uri": "https://oauth2.googleapis.com/token",
+    "expiry": "2099-01-01T00:00:00Z",
+}
+
+
+class StandInGmail(BaseHTTPRequestHandler):
+    """Minimal Gmail API: users.getProfile and users.messages.send."""
+
+    latency = 0.1
+    requests = Counter()
+
+    def _reply(self, payload: dict) -> None:
+        time.sleep(self.latency)
+        data = json.dumps(payload).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        self.requests["getProfile"] += 1
+        self._reply({"emailAddress": "bench@example.com"})
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        self.requests["send"] += 1
+        self._reply({"id": f"stand-in-{sum(self.requests.values())}"})
+
+    def log_message(self, format, *args):
+        pass
+
+
+async def time_cold_start(workdir: str, endpoint: str) -> tuple[float, float]:
+    """Seconds from spawn to initialize() returning, and to the first email being sent."""
+    server_params = StdioServerParameters(
+        command=sys.executable, args=[SERVER_SCRIPT], cwd=workdir,
+        env={**os.environ, "GMAIL_API_ENDPOINT": endpoint},
+    )
+    start = time.perf_counter()
+    async with stdio_client(server_params, errlog=open(os.devnull, "w")) as (read, write):
+        async with ClientSession(read, write) as session:
+            await session.initialize()
+            handshake = time.perf_counter() - start
+            result = await session.call_tool("send_email", {"recipient": "to@example.com", "subject": "bench", "body": "42"})
+            queue_id = int(re.search(r"Queue ID: (\d+)", result.content[0].text).group(1))
+            while True:
+                status = await session.call_tool("get_send_status", {"queue_id": queue_id})
+                state = json.loads(status.content[0].text)["status"]
+                if state == "sent":
+                    return handshake, time.perf_counter() - start
+                if state == "failed":
+                    raise RuntimeError(f"send failed: {status.content[0].text}")
+                await asyncio.sleep(0.005)
+
+def summary(label: str, samples: list[float]) -> str:
+    return (f"  {label:<12} min {min(samples) * 1000:8.1f} ms   median {statistics.median(samples) * 1000:8.1f} ms"
+            f"   max {max(samples) * 1000:8.1f} ms")
+
+async def main(runs: int, latency: float) -> None:
+    StandInGmail.latency = latency
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), StandInGmail)
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    endpoint = f"http://127.0.0.1:{httpd.server_port}/"
+
+    with tempfile.TemporaryDirectory() as workdir:
+        with open(os.path.join(workdir, "token.json"), "w") as f:
+            json.dump(FAKE_TOKEN, f)
+        # One untimed run so the OS file cache and bytecode cache are warm
+        await time_cold_start(workdir, endpoint)
+
+        for scenario in ("cold", "warm"):
+            StandInGmail.requests.clear()
+            handshakes, sends = [], []
+            for _ in range(runs):
+                if scenario == "cold":
+                    for name in ("gmail_v1_discovery.json", "token_profile.json"):
+                        try:
+                            os.remove(os.path.join(workdir, name))
+                        except FileNotFoundError:
+                            pass
+                handshake, first_send = await time_cold_start(workdir, endpoint)
+                handshakes.append(handshake)
+                sends.append(first_send)
+            requests = ", ".join(f"{name} x{count}" for name, count in sorted(StandInGmail.requests.items()))
+            print(f"{scenario} caches, {runs} runs, {latency * 1000:.0f} ms per API request ({requests})")
+            print(summary("handshake", handshakes))
+            print(summary("first send", sends))
+    httpd.shutdown()
+
+if __name__ == "__main__":
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    latency = float(sys.argv[2]) / 1000 if len(sys.argv) > 2 else 0.1
+    asyncio.run(main(runs, latency))
@@ -0,0 +1,44 @@
+# bench_startup.py - Time from spawning an MCP server over stdio to a completed initialize handshake
+#
+# Usage: python bench_startup.py [server_script] [runs]
+#   python bench_startup.py                      # mcp_server.py, 10 runs
+#   python bench_startup.py gmail_mcp_server.py 5
+
+import asyncio
+import statistics
+import sys
+import time
+
+from mcp import ClientSession, StdioServerParameters
+from mcp.client.stdio import stdio_client
+
+
+async def time_handshake(script: str) -> float:
+    """Seconds from process spawn until initialize() returns."""
+    server_params = StdioServerParameters(command=sys.executable, args=[script])
+    start = time.perf_counter()
+    async with stdio_client(server_params) as (read, write):
+        async with ClientSession(read, write) as session:
+            await session.initialize()
+            return time.perf_counter() - start
+
+async def main(script: str, runs: int) -> None:
+    # One untimed run so the OS file cache and bytecode cache are warm
+    await time_handshake(script)
+    samples = []
+    for i in range(runs):
+        seconds = await time_handshake(script)
+        samples.append(seconds)
+        print(f"run {i + 1:3d}: {seconds * 1000:8.1f} ms")
+    samples.sort()
+    p95 = samples[min(len(samples) - 1, round(0.95 * (len(samples) - 1)))]
+    print(f"\n{script}: {runs} runs")
+    print(f"  min    {samples[0] * 1000:8.1f} ms")
+    print(f"  median {statistics.median(samples) * 1000:8.1f} ms")
+    print(f"  p95    {p95 * 1000:8.1f} ms")
+    print(f"  max    {samples[-1] * 1000:8.1f} ms")
+
+if __name__ == "__main__":
+    script = sys.argv[1] if len(sys.argv) > 1 else "mcp_server.py"
+    runs = int(sys.argv[2]) if len(sys.argv) > 2 else 10
+    asyncio.run(main(script, runs))
@@ -0,0 +1,380 @@
+# bignum.py - Big-integer engine behind the factorial / power tools
+
+import base64
+import math
+import os
+import sys
+import threading
+from collections import OrderedDict
+from decimal import Decimal, localcontext, MAX_EMAX, MIN_EMIN, ROUND_FLOOR
+from fractions import Fraction
+
+# Largest integer result (in bits) a tool may compute; checked before computing
+MAX_RESULT_BITS = int(os.getenv("MCP_MAX_RESULT_BITS", 64 * 1024 * 1024))
+
+# Largest result returned as a plain decimal number (Python's int->str limit by default)
+MAX_DECIMAL_DIGITS = int(os.getenv("MCP_MAX_DECIMAL_DIGITS", sys.get_int_max_str_digits() or 4300))
+
+# Number of significant digits returned by output="leading"
+LEADING_DIGITS = 30
+
+# Largest n accepted by factorial_mod when n < m (the loop is O(n))
+MAX_FACTORIAL_MOD_N = 10_000_000
+
+# Total size of memoized factorials kept by the factorial table
+FACTORIAL_CACHE_BITS = int(os.getenv("MCP_FACTORIAL_CACHE_BITS", 32 * 1024 * 1024))
+
+OUTPUT_FORMATS = ("decimal", "digits", "leading", "hex", "base64")
+
+_LOG10_2 = math.log10(2)
+
+# Below this size digits / leading are taken from the exact integer, which is cheap
+_APPROXIMATE_MIN_BITS = 1024
+
+
+class ResultTooLarge(ValueError):
+    """Raised when a result would exceed the configured size limits."""
+
+
+# ------------------------------------------------
+# SIZE ESTIMATES
+# ------------------------------------------------
+def factorial_bits(n: int) -> float:
+    """Estimated bit length of n!."""
+    return math.lgamma(n + 1) / math.log(2) if n > 1 else 1.0
+
+def power_bits(a: int, b: int) -> float:
+    """Estimated bit length of a ** b for b >= 0."""
+    if b == 0 or abs(a) <= 1:
+        return 1.0
+    return b * math.log2(abs(a))
+
+def encoded_bytes(bits: float, output: str = "decimal") -> float:
+    """Estimated size in bytes of a bits-long integer result rendered as output."""
+    if output == "decimal":
+        return bits * _LOG10_2 + 2
+    if output == "hex":
+        return bits / 4 + 3
+    if output == "base64":
+        return math.ceil(bits / 24) * 4 + 3
+    return LEADING_DIGITS + 8
+
+def check_size(bits: float, output: str) -> None:
+    """Reject a computation before it starts if its result would be too large."""
+    if output not in OUTPUT_FORMATS:
+        raise ValueError(f"Unknown output format: {output} (expected one of {', '.join(OUTPUT_FORMATS)})")
+    if bits > MAX_RESULT_BITS:
+        raise ResultTooLarge(
+            f"Result would have ~{int(bits):,} bits (limit {MAX_RESULT_BITS:,}); "
+            f"use a modular variant (power_mod / factorial_mod) instead"
+        )
+    digits = bits * _LOG10_2
+    if output == "decimal" and digits > MAX_DECIMAL_DIGITS + 1:
+        raise ResultTooLarge(
+            f"Result would have ~{int(digits):,} decimal digits (limit {MAX_DECIMAL_DIGITS:,}); "
+            f"request output='digits', 'leading', 'hex' or 'base64'"
+        )
+
+
+# ------------------------------------------------
+# OUTPUT ENCODINGS
+# ------------------------------------------------
+def decimal_digits(value: int) -> int:
+    """Exact number of decimal digits of value, without converting it to a string."""
+    value = abs(value)
+    if value < 10:
+        return 1
+    # 2**(b-1) <= value < 2**b, so the digit count is d or d + 1
+    d = int((value.bit_length() - 1) * _LOG10_2) + 1
+    return d + 1 if value >= 10 ** d else d
+
+def leading_digits(value: int, count: int = LEADING_DIGITS) -> str:
+    """First count significant digits of value in scientific notation."""
+    digits = decimal_digits(value)
+    if digits <= count:
+        return str(value)
+    head = str(abs(value) // 10 ** (digits - count))
+    sign = "-" if value < 0 else ""
+    return f"{sign}{head[0]}.{head[1:]}e+{digits - 1}"
+
+def render(value: int, output: str = "decimal"):
+    """Encode an integer result. Only "decimal" converts the whole number to base 10."""
+    if output == "decimal":
+        if value.bit_length() * _LOG10_2 > MAX_DECIMAL_DIGITS:
+            raise ResultTooLarge(
+                f"Result has ~{int(value.bit_length() * _LOG10_2):,} decimal digits (limit {MAX_DECIMAL_DIGITS:,}); "
+                f"request output='digits', 'leading', 'hex' or 'base64'"
+            )
+        return value
+    if output == "digits":
+        return decimal_digits(value)
+    if output == "leading":
+        return leading_digits(value)
+    if output == "hex":
+        return hex(value)
+    if output == "base64":
+        # big-endian magnitude; a leading '-' marks negative numbers
+        magnitude = abs(value).to_bytes((abs(value).bit_length() + 7) // 8 or 1, "big")
+        return ("-" if value < 0 else "") + base64.b64encode(magnitude).decode("ascii")
+    raise ValueError(f"Unknown output format: {output} (expected one of {', '.join(OUTPUT_FORMATS)})")
+
+
+# ------------------------------------------------
+# FACTORIAL
+# ------------------------------------------------
+def range_product(lo: int, hi: int) -> int:
+    """Product of lo..hi inclusive by binary splitting (balanced multiplications)."""
+    if lo > hi:
+        return 1
+    if hi - lo < 8:
+        result = lo
+        for i in range(lo + 1, hi + 1):
+            result *= i
+        return result
+    mid = (lo + hi) // 2
+    return range_product(lo, mid) * range_product(mid + 1, hi)
+
+
+class FactorialTable:
+    """Memoized factorials with incremental extension.
+
+    Recently computed n! values are kept in an LRU bounded by total bit size.
+    A request for n is served from an exact hit, or by extending the largest
+    cached m < n with the product (m+1)..n when that range is short relative
+    to n; otherwise it falls back to math.factorial.
+    """
+
+    def __init__(self, max_bits: int = FACTORIAL_CACHE_BITS):
+        self.max_bits = max_bits
+        self._values = OrderedDict()
+        self._bits = 0
+        self._lock = threading.Lock()
+
+    def get(self, n: int) -> int:
+        if n < 0:
+            raise ValueError("factorial() not defined for negative values")
+        with self._lock:
+            if n in self._values:
+                self._values.move_to_end(n)
+                return self._values[n]
+            base = max((m for m in self._values if m < n), default=None)
+            base_value = self._values[base] if base is not None else None
+
+        if base is not None and n - base <= max(1000, n // 8):
+            value = base_value * range_product(base + 1, n)
+        else:
+            value = math.factorial(n)
+        self._store(n, value)
+        return value
+
+    def _store(self, n: int, value: int) -> None:
+        bits = value.bit_length()
+        if bits > self.max_bits:
+            return
+        with self._lock:
+            if n in self._values:
+                return
+            self._values[n] = value
+            self._bits += bits
+            while self._bits > self.max_bits:
+                _, evicted = self._values.popitem(last=False)
+                self._bits -= evicted.bit_length()
+
+
+factorial_table = FactorialTable()
+
+# Bernoulli numbers B2, B4, ..., B30 for the Stirling series of ln(n!)
+_BERNOULLI = [Fraction(1, 6), Fraction(-1, 30), Fraction(1, 42), Fraction(-1, 30), Fraction(5, 66),
+              Fraction(-691, 2730), Fraction(7, 6), Fraction(-3617, 510), Fraction(43867, 798),
+              Fraction(-174611, 330), Fraction(854513, 138), Fraction(-236364091, 2730),
+              Fraction(8553103, 6), Fraction(-23749461029, 870), Fraction(8615841276005, 14322)]
+
+# Fractional parts of log10(n!) closer than this to an integer are checked against the exact value
+_DIGIT_BOUNDARY = Decimal(10) ** -20
+
+def _decimal_pi() -> Decimal:
+    """pi to the current decimal precision (the decimal module documentation's recipe)."""
+    with localcontext() as ctx:
+        ctx.prec += 2
+        three = Decimal(3)
+        lasts, t, total, n, na, d, da = 0, three, three, 1, 0, 0, 24
+        while total != lasts:
+            lasts = total
+            n, na = n + na, na + 8
+            d, da = d + da, da + 32
+            t = (t * n) / d
+            total += t
+    return +total
+
+def log10_factorial(n: int, places: int) -> Decimal | None:
+    """log10(n!) to about places decimal places by the Stirling series, or None
+    if n is too small for the series to converge that far."""
+    with _decimal_context(places + len(str(n)) + 10):
+        x = Decimal(n)
+        ln = x * x.ln() - x + (2 * _decimal_pi() * x).ln() / 2
+        power = x
+        for k, bernoulli in enumerate(_BERNOULLI, start=1):
+            # B(2k) / (2k (2k - 1) n^(2k - 1))
+            term = Decimal(bernoulli.numerator) / (bernoulli.denominator * 2 * k * (2 * k - 1)) / power
+            ln += term
+            if abs(term) < Decimal(10) ** -(places + 5):
+                return ln / Decimal(10).ln()
+            power *= x * x
+    return None
+
+def _approximate_factorial(n: int, output: str):
+    """digits / leading output of n! from log10(n!), or None near a digit-count boundary."""
+    log = log10_factorial(n, LEADING_DIGITS + 20)
+    if log is None:
+        return None
+    with _decimal_context(LEADING_DIGITS + 30 + len(str(n))):
+        fraction = log - log.to_integral_value(rounding=ROUND_FLOOR)
+        if fraction < _DIGIT_BOUNDARY or fraction > 1 - _DIGIT_BOUNDARY:
+            return None
+        return _render_approximate(Decimal(10) ** log, output)
+
+def factorial(n: int, output: str = "decimal"):
+    """n! encoded per output, rejected up front if it would be too large. digits /
+    leading of large factorials come from log10(n!), without computing n!."""
+    if n < 0:
+        raise ValueError("factorial() not defined for negative values")
+    if output in ("digits", "leading") and factorial_bits(n) > _APPROXIMATE_MIN_BITS:
+        result = _approximate_factorial(n, output)
+        if result is not None:
+            return result
+    check_size(factorial_bits(n), output)
+    return render(factorial_table.get(n), output)
+
+def factorial_mod(n: int, m: int) -> int:
+    """n! mod m without building n!."""
+    if m == 0:
+        raise ZeroDivisionError("factorial_mod() modulus must be non-zero")
+    if n < 0:
+        raise ValueError("factorial() not defined for negative values")
+    if n >= abs(m):
+        # m divides n! once n reaches |m|
+        return 0
+    if n > MAX_FACTORIAL_MOD_N:
+        raise ResultTooLarge(f"factorial_mod() supports n up to {MAX_FACTORIAL_MOD_N:,} when n < m")
+    result = 1 % m
+    for i in range(2, n + 1):
+        result = result * i % m
+    return result
+
+
+# ------------------------------------------------
+# POWER
+# ------------------------------------------------
+def _decimal_context(precision: int):
+    """Decimal context with precision significant digits and an unbounded exponent."""
+    return localcontext(prec=precision, Emax=MAX_EMAX, Emin=MIN_EMIN)
+
+def _render_approximate(result: Decimal, output: str):
+    """digits / leading output from a decimal approximation carrying guard digits."""
+    if output == "digits":
+        return result.adjusted() + 1
+    sign, digits, _ = result.as_tuple()
+    head = "".join(map(str, digits))[:LEADING_DIGITS].ljust(LEADING_DIGITS, "0")
+    return f"{'-' if sign else ''}{head[0]}.{head[1:]}e+{result.adjusted()}"
+
+def power(a: int, b: int, output: str = "decimal"):
+    """a ** b encoded per output. digits / leading are computed in decimal floating
+    point with guard digits, so they never materialize the full integer."""
+    if b < 0:
+        return int(a ** b)
+    if output in ("digits", "leading") and abs(a) > 1 and power_bits(a, b) > _APPROXIMATE_MIN_BITS:
+        with _decimal_context(LEADING_DIGITS + 20):
+            return _render_approximate(Decimal(a) ** b, output)
+    check_size(power_bits(a, b), output)
+    return render(a ** b, output)
+
+
+# ------------------------------------------------
+# FIBONACCI
+# ------------------------------------------------
+# Terms kept in the process-wide Fibonacci prefix (memory grows ~quadratically with this)
+FIB_CACHE_TERMS = int(os.getenv("MCP_FIB_CACHE_TERMS", 10_000))
+
+# Maximum number of terms returned by one fibonacci_numbers page
+FIB_PAGE_LIMIT = 1000
+
+_LOG2_PHI = math.log2((1 + 5 ** 0.5) / 2)
+
+def fibonacci_bits(n: int) -> float:
+    """Estimated bit length of F(n)."""
+    return max(1.0, n * _LOG2_PHI)
+
+def fibonacci_pair(n: int) -> tuple[int, int]:
+    """(F(n), F(n+1)) by fast doubling in O(log n) multiplications."""
+    if n < 0:
+        raise ValueError("Fibonacci index must be non-negative")
+    a, b = 0, 1
+    for bit in bin(n)[2:]:
+        # F(2k) = F(k) * (2F(k+1) - F(k)),  F(2k+1) = F(k)^2 + F(k+1)^2
+        c = a * (2 * b - a)
+        d = a * a + b * b
+        a, b = (d, c + d) if bit == "1" else (c, d)
+    return a, b
+
+def fibonacci(n: int, output: str = "decimal"):
+    """F(n) encoded per output, rejected up front if it would be too large."""
+    if n < 0:
+        raise ValueError("Fibonacci index must be non-negative")
+    if output in ("digits", "leading") and fibonacci_bits(n) > _APPROXIMATE_MIN_BITS:
+        # Binet: F(n) = round(phi**n / sqrt(5)); the psi**n term is negligible here
+        with _decimal_context(LEADING_DIGITS + 20 + len(str(n))):
+            sqrt5 = Decimal(5).sqrt()
+            return _render_approximate(((1 + sqrt5) / 2) ** n / sqrt5, output)
+    check_size(fibonacci_bits(n), output)
+    return render(fibonacci_pair(n)[0], output)
+
+
+class FibonacciCache:
+    """Process-wide prefix F(0)..F(max_terms) of the Fibonacci sequence.
+
+    The prefix is extended lazily and shared by every request, so overlapping
+    pages never recompute it. Pages beyond the prefix seek to their first term
+    with fast doubling and iterate from there, keeping memory bounded.
+    """
+
+    def __init__(self, max_terms: int = FIB_CACHE_TERMS):
+        self.max_terms = max_terms
+        self._terms = [0, 1]
+        self._lock = threading.Lock()
+
+    def page(self, offset: int, count: int) -> list[int]:
+        """F(offset)..F(offset + count - 1)."""
+        if offset < 0 or count < 0:
+            raise ValueError("offset and count must be non-negative")
+        end = offset + count
+        terms = []
+        a = b = None
+        cached_end = offset
+        if offset < self.max_terms:
+            cached_end = min(end, self.max_terms)
+            with self._lock:
+                while len(self._terms) <= cached_end:
+                    self._terms.append(self._terms[-1] + self._terms[-2])
+                terms = self._terms[offset:cached_end]
+                if cached_end + 1 < len(self._terms):
+                    a, b = self._terms[cached_end], self._terms[cached_end + 1]
+        if end > cached_end:
+            if a is None:
+                a, b = fibonacci_pair(cached_end)
+            for _ in range(end - cached_end):
+                terms.append(a)
+                a, b = b, a + b
+        return terms
+
+
+fibonacci_cache = FibonacciCache()
+
+def fibonacci_page(offset: int, count: int) -> list[int]:
+    """Terms offset..offset+count-1, rejected if a term would not fit a plain decimal result."""
+    last = offset + count - 1
+    if count > 0 and fibonacci_bits(last) * _LOG10_2 > MAX_DECIMAL_DIGITS:
+        raise ResultTooLarge(
+            f"F({last}) has ~{int(fibonacci_bits(last) * _LOG10_2):,} decimal digits (limit {MAX_DECIMAL_DIGITS:,}); "
+            f"use fibonacci_nth with output='digits', 'leading', 'hex' or 'base64'"
+        )
+    return fibonacci_cache.page(offset, count)
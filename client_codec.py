@@ -0,0 +1,80 @@
+# client_codec.py - Argument coercion and result decoding shared by the agent clients
+
+import json
+
+import numpy as np
+
+import packed
+
+
+def schema_types(param_info: dict) -> set[str]:
+    """JSON schema types a tool parameter accepts, including anyOf unions (e.g. list | dict)."""
+    if 'type' in param_info:
+        return {param_info['type']}
+    return {option['type'] for option in param_info.get('anyOf', []) if 'type' in option}
+
+def parse_list(value: str) -> list:
+    """Comma-separated or [v1,v2,v3] text to a list of ints, floats or strings."""
+    value_list = value.strip('[]').replace(' ', '').split(',')
+    try:
+        return [int(x) for x in value_list if x]
+    except ValueError:
+        try:
+            return [float(x) for x in value_list if x]
+        except ValueError:
+            return [x for x in value_list if x]
+
+def coerce_argument(value: str, param_info: dict):
+    """Convert one FUNCTION_CALL parameter to the type its schema expects.
+
+    For array/object parameters, JSON objects (packed arrays) and JSON arrays
+    of objects (batch_eval operations) are passed through parsed.
+    """
+    types = schema_types(param_info)
+    text = value.strip()
+    if types & {'array', 'object'} and text.startswith(('{', '[{')):
+        return json.loads(text)
+    if 'array' in types:
+        return parse_list(text)
+    if 'integer' in types:
+        return int(value)
+    if 'number' in types:
+        return float(value)
+    return str(value)
+
+def decode_result_text(text: str):
+    """A tool result item: a NumPy array if the text is a packed array, else the text itself.
+
+    Packed arrays are decoded with np.frombuffer, with no per-element parsing.
+    """
+    if not text.lstrip().startswith('{'):
+        return text
+    try:
+        value = json.loads(text)
+    except ValueError:
+        return text
+    if packed.is_packed(value):
+        return packed.unpack_array(value)
+    return text
+
+def format_result_item(item) -> str:
+    """Text shown to the model for one decoded result item."""
+    if isinstance(item, np.ndarray):
+        return ','.join(map(str, item.tolist()))
+    return str(item)
+
+def reusable_text(text: str) -> str:
+    """A result item as the model should pass it to the next call.
+
+    Packed arrays are handed on as they came, on one line, so an array
+    parameter receives them unchanged; anything else is returned as is.
+    """
+    if not text.lstrip().startswith('{'):
+        return text
+    try:
+        value = json.loads(text)
+    except ValueError:
+        return text
+    if packed.is_packed(value):
+        return json.dumps(value, separators=(',', ':'))
+    return text
@@ -0,0 +1,220 @@
+# cpu_executor.py - Run CPU-heavy tools in worker processes with deadlines and result size guards
+#
+# A sync tool running on the server's event loop blocks every other request
+# until it finishes. offload() turns such a tool into an async tool whose
+# work runs in a ProcessPoolExecutor. Each call has a deadline; a call that
+# times out or is cancelled (client cancellation or disconnect) while it is
+# running is stopped by terminating the pool's workers, and calls that were
+# sharing that pool are resubmitted to a fresh one.
+
+import asyncio
+import functools
+import inspect
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import tool_cache
+import tool_profiler
+from tool_metrics import payload_bytes
+
+# Worker processes; 0 runs offloaded tools inline on the event loop as before
+CPU_WORKERS = int(os.getenv("MCP_CPU_WORKERS", min(4, os.cpu_count() or 1)))
+
+# Per-call deadline in seconds
+CPU_TIMEOUT = float(os.getenv("MCP_CPU_TIMEOUT", 60))
+
+# Largest serialized result an offloaded tool may return
+MAX_RESULT_BYTES = int(os.getenv("MCP_MAX_RESULT_BYTES", 16 * 1024 * 1024))
+
+# Seconds between progress notifications while an offloaded call runs
+PROGRESS_INTERVAL = float(os.getenv("MCP_PROGRESS_INTERVAL", 1.0))
+
+
+class CallTimeout(TimeoutError):
+    """An offloaded tool call did not finish before its deadline."""
+
+
+class OversizedResult(ValueError):
+    """An offloaded tool's result is, or would be, larger than MAX_RESULT_BYTES."""
+
+
+def check_result_bytes(name: str, size: float, max_bytes: int, estimated: bool = False) -> None:
+    if max_bytes and size > max_bytes:
+        what = "would be ~" if estimated else "is "
+        raise OversizedResult(f"{name} result {what}{int(size):,} bytes (limit {max_bytes:,})")
+
+def _call_in_worker(fn, args: tuple, kwargs: dict, max_bytes: int, profile_dir: str | None = None) -> tuple:
+    """Runs in the worker: call fn and refuse to send back an oversized result.
+
+    With profile_dir the call is profiled here and a description of the
+    profile written there is returned too (see tool_profiler.run_profiled).
+    """
+    profile = None
+    if profile_dir is None:
+        result = fn(*args, **kwargs)
+    else:
+        result, profile = tool_profiler.run_profiled(fn, args, kwargs, profile_dir)
+    size = payload_bytes(result)
+    check_result_bytes(fn.__name__, size, max_bytes)
+    return result, size, profile
+
+
+class CpuExecutor:
+    """A lazily started process pool that can be torn down to stop running calls."""
+
+    def __init__(self, workers: int = CPU_WORKERS, timeout: float = CPU_TIMEOUT,
+                 max_result_bytes: int = MAX_RESULT_BYTES):
+        self.workers = workers
+        self.timeout = timeout
+        self.max_result_bytes = max_result_bytes
+        self._pool = None
+        self._lock = threading.Lock()
+        self.resets = 0
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._pool is None:
+                # spawn everywhere: forking a process that runs an event loop and threads is unsafe
+                self._pool = ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context("spawn"))
+            return self._pool
+
+    def reset(self, pool: ProcessPoolExecutor) -> None:
+        """Kill pool's workers and start a new pool on the next call.
+
+        Terminating the workers is the only way to stop a call that is
+        already running; other calls on the same pool fail with
+        BrokenProcessPool and are resubmitted by run().
+        """
+        with self._lock:
+            if self._pool is not pool:
+                return
+            self._pool = None
+            self.resets += 1
+        # ProcessPoolExecutor has no public way to stop running work before Python 3.14
+        for process in list(getattr(pool, "_processes", {}).values()):
+            process.terminate()
+        pool.shutdown(wait=False, cancel_futures=True)
+
+    def shutdown(self) -> None:
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=False, cancel_futures=True)
+
+    async def run(self, fn, args: tuple = (), kwargs: dict | None = None, timeout: float | None = None) -> tuple:
+        """Run fn(*args, **kwargs) in a worker process within timeout seconds.
+
+        Returns (result, serialized size of result in bytes). If the calling
+        tool is being profiled, fn is profiled in the worker as well.
+        """
+        kwargs = kwargs or {}
+        if self.workers <= 0:
+            return _call_in_worker(fn, args, kwargs, self.max_result_bytes)[:2]
+        profiles = tool_profiler.worker_profiles()
+
+        loop = asyncio.get_running_loop()
+        timeout = self.timeout if timeout is None else timeout
+        deadline = loop.time() + timeout
+        resubmitted = False
+        while True:
+            pool = self._get_pool()
+            future = pool.submit(_call_in_worker, fn, args, kwargs, self.max_result_bytes,
+                                 profiles.directory if profiles is not None else None)
+            try:
+                result, size, profile = await asyncio.wait_for(asyncio.wrap_future(future),
+                                                               max(0.0, deadline - loop.time()))
+                if profile is not None:
+                    profiles.entries.append(profile)
+                return result, size
+            except BrokenProcessPool:
+                if self._pool is not pool and not resubmitted:
+                    # another call's timeout or cancellation tore this pool down
+                    resubmitted = True
+                    continue
+                self.reset(pool)
+                raise
+            except (TimeoutError, asyncio.CancelledError) as e:
+                future.cancel()
+                if not future.done():
+                    self.reset(pool)
+                if isinstance(e, TimeoutError):
+                    raise CallTimeout(f"{fn.__name__} did not finish within {timeout:g}s") from None
+                raise
+
+
+executor = CpuExecutor()
+
+
+async def _wait_reporting(task: asyncio.Task, name: str, timeout: float, progress) -> tuple:
+    """Await task, calling progress(elapsed, timeout, message) every PROGRESS_INTERVAL seconds."""
+    loop = asyncio.get_running_loop()
+    started = loop.time()
+    try:
+        while True:
+            done, _ = await asyncio.wait({task}, timeout=PROGRESS_INTERVAL)
+            if done:
+                return task.result()
+            elapsed = loop.time() - started
+            await progress(elapsed, timeout, f"{name}: running for {elapsed:.0f}s")
+    finally:
+        # cancelled while waiting: the task's own cancellation handling stops the worker
+        task.cancel()
+
+def offload(fn, result_bytes=None, executor: CpuExecutor = executor, progress=None, store=None, inline=None):
+    """An async tool that runs the sync tool fn on executor.
+
+    result_bytes, if given, is called with fn's arguments by name (defaults
+    applied) and returns the estimated serialized result size; calls whose
+    estimate exceeds the executor's limit are rejected before any work is
+    done. If fn is memoized with @pure, its cache is consulted and filled in
+    this process, so cache hits never reach the pool.
+
+    inline, if given, is called with fn's arguments by name; calls for which
+    it returns true are cheap enough to run in this process, e.g. because
+    they are served from a cache that worker processes would not share.
+
+    progress, if given, is an async progress(elapsed, total, message) called
+    periodically while the call runs (total is the deadline in seconds).
+    store, if given, is a result_store.ResultStore: results too large to
+    return inline are spooled to it and a handle dict is returned instead.
+    """
+    signature = inspect.signature(fn)
+    cache = getattr(fn, "cache", None)
+    # the @pure wrapper is bypassed when running inline: the cache is already handled here
+    local_fn = fn.__wrapped__ if cache is not None else fn
+
+    @functools.wraps(fn)
+    async def wrapper(*args, **kwargs):
+        bound = signature.bind(*args, **kwargs)
+        bound.apply_defaults()
+        key = tool_cache.make_key(signature, args, kwargs) if cache is not None else None
+        result = tool_cache.MISSING
+        if key is not None:
+            result = cache.get(key)
+            size = payload_bytes(result) if result is not tool_cache.MISSING and store is not None else 0
+        if result is tool_cache.MISSING:
+            if result_bytes is not None:
+                check_result_bytes(fn.__name__, result_bytes(**bound.arguments), executor.max_result_bytes, estimated=True)
+            if inline is not None and inline(**bound.arguments):
+                result = local_fn(*bound.args, **bound.kwargs)
+                size = payload_bytes(result) if store is not None else 0
+            elif progress is None:
+                result, size = await executor.run(fn, bound.args, bound.kwargs)
+            else:
+                call = asyncio.ensure_future(executor.run(fn, bound.args, bound.kwargs))
+                result, size = await _wait_reporting(call, fn.__name__, executor.timeout, progress)
+            if key is not None:
+                cache.put(key, result)
+        if store is not None and size > store.inline_bytes:
+            result = await asyncio.to_thread(store.put, fn.__name__, result)
+        return result
+
+    if store is not None and signature.return_annotation is not inspect.Signature.empty:
+        # large results come back as a result_store handle
+        returns = signature.return_annotation | dict
+        wrapper.__signature__ = signature.replace(return_annotation=returns)
+        wrapper.__annotations__ = {**fn.__annotations__, "return": returns}
+    return wrapper
@@ -0,0 +1,170 @@
+# expression_compiler.py - Compile arithmetic expressions over the MCP math tools
+
+import ast
+import math
+import operator
+
+import bignum
+
+_BINARY_OPS = {
+    ast.Add: operator.add,
+    ast.Sub: operator.sub,
+    ast.Mult: operator.mul,
+    ast.Div: operator.truediv,
+    ast.FloorDiv: operator.floordiv,
+    ast.Mod: operator.mod,
+    ast.Pow: operator.pow,
+}
+
+_UNARY_OPS = {
+    ast.UAdd: operator.pos,
+    ast.USub: operator.neg,
+}
+
+
+class ExpressionError(ValueError):
+    """Raised when an expression uses syntax or names the compiler does not allow."""
+
+
+def _check_number(value):
+    # str * int and list * int would allocate without bound; only numbers take part in arithmetic
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        raise ExpressionError(f"Arithmetic operands must be numbers, not {type(value).__name__}")
+    return value
+
+def _check_real(value):
+    if isinstance(value, complex):
+        raise ExpressionError("Result is not a real number")
+    if isinstance(value, float) and not math.isfinite(value):
+        raise ExpressionError("Result is not finite")
+    return value
+
+def _multiply(left, right):
+    if isinstance(left, int) and isinstance(right, int):
+        # the same size limit as the power / factorial tools, checked before multiplying
+        bignum.check_size(left.bit_length() + right.bit_length(), "decimal")
+    return left * right
+
+def _power_op(power):
+    """`**`: ints with a non-negative int exponent go to the power tool (or get its size
+    check), anything else is plain float exponentiation."""
+    def apply(left, right):
+        if isinstance(left, int) and isinstance(right, int) and right >= 0:
+            if power is not None:
+                return power(left, right)
+            bignum.check_size(bignum.power_bits(left, right), "decimal")
+        return left ** right
+    return apply
+
+
+class CompiledExpression:
+    """A program compiled once from source text and evaluated on demand."""
+
+    def __init__(self, source: str, steps: list, result):
+        self.source = source
+        self._steps = steps
+        self._result = result
+
+    def __call__(self) -> dict:
+        env = {}
+        for name, step in self._steps:
+            env[name] = step(env)
+        return {"result": self._result(env), "intermediates": env}
+
+
+def compile_expression(source: str, functions: dict) -> CompiledExpression:
+    """Compile source into a CompiledExpression over the given function table.
+
+    source is zero or more `name = expr` statements followed by a final
+    expression, separated by ';' or newlines, e.g.
+    `codes = ord_list("INDIA"); sum(exp(codes))`. Only calls to names in
+    functions, previously assigned names, numeric/string literals, lists and
+    arithmetic operators on numbers are accepted. `**` on ints with a
+    non-negative int exponent is routed to functions["power"] when present,
+    and integer products are size-checked, so results get the same guards as
+    the power tool.
+    """
+    try:
+        tree = ast.parse(source.strip(), mode="exec")
+    except SyntaxError as e:
+        raise ExpressionError(f"Invalid expression: {e.msg}") from e
+    if not tree.body or not isinstance(tree.body[-1], ast.Expr):
+        raise ExpressionError("Expression must end with a value to return")
+
+    compiler = _Compiler(functions)
+    steps = []
+    for statement in tree.body[:-1]:
+        if not (isinstance(statement, ast.Assign) and len(statement.targets) == 1
+                and isinstance(statement.targets[0], ast.Name)):
+            raise ExpressionError("Only `name = expression` statements may precede the result")
+        name = statement.targets[0].id
+        if name in functions:
+            raise ExpressionError(f"Cannot assign to function name: {name}")
+        steps.append((name, compiler.compile(statement.value)))
+        compiler.names.add(name)
+    return CompiledExpression(source, steps, compiler.compile(tree.body[-1].value))
+
+
+class _Compiler:
+    def __init__(self, functions: dict):
+        self.functions = functions
+        self.names = set()
+
+    def compile(self, node):
+        method = getattr(self, f"_compile_{type(node).__name__}", None)
+        if method is None:
+            raise ExpressionError(f"Unsupported syntax: {type(node).__name__}")
+        return method(node)
+
+    def _compile_Constant(self, node):
+        value = node.value
+        if isinstance(value, bool) or not isinstance(value, (int, float, str)):
+            raise ExpressionError(f"Unsupported literal: {value!r}")
+        return lambda env: value
+
+    def _compile_Name(self, node):
+        name = node.id
+        if name not in self.names:
+            raise ExpressionError(f"Unknown name: {name}")
+        return lambda env: env[name]
+
+    def _compile_List(self, node):
+        items = [self.compile(item) for item in node.elts]
+        return lambda env: [item(env) for item in items]
+
+    _compile_Tuple = _compile_List
+
+    def _compile_BinOp(self, node):
+        op = _BINARY_OPS.get(type(node.op))
+        if op is None:
+            raise ExpressionError(f"Unsupported operator: {type(node.op).__name__}")
+        if isinstance(node.op, ast.Pow):
+            op = _power_op(self.functions.get("power"))
+        elif isinstance(node.op, ast.Mult):
+            op = _multiply
+        left, right = self.compile(node.left), self.compile(node.right)
+
+        def apply(env):
+            try:
+                return _check_real(op(_check_number(left(env)), _check_number(right(env))))
+            except OverflowError as e:
+                raise ExpressionError(f"Result is too large: {e}") from None
+        return apply
+
+    def _compile_UnaryOp(self, node):
+        op = _UNARY_OPS.get(type(node.op))
+        if op is None:
+            raise ExpressionError(f"Unsupported operator: {type(node.op).__name__}")
+        operand = self.compile(node.operand)
+        return lambda env: op(_check_number(operand(env)))
+
+    def _compile_Call(self, node):
+        if not isinstance(node.func, ast.Name) or node.func.id not in self.functions:
+            name = node.func.id if isinstance(node.func, ast.Name) else ast.unparse(node.func)
+            raise ExpressionError(f"Unknown function: {name}")
+        if any(isinstance(arg, ast.Starred) for arg in node.args) or any(kw.arg is None for kw in node.keywords):
+            raise ExpressionError("Star arguments are not supported")
+        fn = self.functions[node.func.id]
+        args = [self.compile(arg) for arg in node.args]
+        kwargs = [(kw.arg, self.compile(kw.value)) for kw in node.keywords]
+        return lambda env: fn(*[arg(env) for arg in args], **{k: v(env) for k, v in kwargs})
@@ -4,22 +4,46 @@ import os
 import sys
 import asyncio
 import base64
+import hashlib
+import json
 import logging
+import tempfile
+import threading
+from contextlib import asynccontextmanager
 from email.message import EmailMessage
 from mcp.server.fastmcp import FastMCP
 from mcp.types import TextContent
 from google.auth.transport.requests import Request
 from google.oauth2.credentials import Credentials
 from google_auth_oauthlib.flow import InstalledAppFlow
-from googleapiclient.discovery import build
+from googleapiclient import discovery_cache
+from googleapiclient.discovery import V2_DISCOVERY_URI, build_from_document
 from googleapiclient.errors import HttpError
+from googleapiclient.http import MediaIoBaseUpload
+import gmail_mime
+import gmail_outbox
+import gmail_transport
+import tool_metrics
+import tool_profiler
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+@asynccontextmanager
+async def lifespan(server: FastMCP):
+    """Warm up the Gmail service in the background so the MCP handshake never waits for it,
+    and drain the outbox while the server runs"""
+    warmup = asyncio.create_task(asyncio.to_thread(warm_up_gmail_service))
+    sending = asyncio.create_task(sender.run())
+    try:
+        yield
+    finally:
+        warmup.cancel()
+        sending.cancel()
+
 # Initialize FastMCP
-mcp = FastMCP("Gmail")
+mcp = FastMCP("Gmail", lifespan=lifespan)
 
 # Gmail API scopes
 SCOPES = ['https://www.googleapis.com/auth/gmail.modify']
@@ -27,16 +51,37 @@ SCOPES = ['https://www.googleapis.com/auth/gmail.modify']
 # Configuration - Update these paths to your OAuth files
 CREDENTIALS_FILE = "credentials.json"  # Path to your OAuth credentials file
 TOKEN_FILE = "token.json"  # Where to store the access token
+PROFILE_FILE = "token_profile.json"  # Cached account address for the token
+DISCOVERY_FILE = "gmail_v1_discovery.json"  # Local copy of the Gmail API discovery document
+
+# Base URL of the Gmail API, e.g. a local stand-in server for benchmarks (default: from the discovery document)
+API_ENDPOINT = os.getenv("GMAIL_API_ENDPOINT")
+
+# Gmail API limit on calls in one batch HTTP request
+MAX_BATCH_SIZE = 100
+
+# Upper bound on the messages accepted by a single send_emails_batch call
+MAX_BATCH_MESSAGES = 1000
+
+# Messages with attachments are uploaded in chunks of this size (a multiple of 256 KiB)
+UPLOAD_CHUNK_BYTES = int(os.getenv("GMAIL_UPLOAD_CHUNK_BYTES", 4 * 1024 * 1024))
 
 class GmailService:
     """Simplified Gmail service for sending emails"""
     
-    def __init__(self, creds_file: str, token_file: str):
+    def __init__(self, creds_file: str, token_file: str, service=None, user_email: str | None = None):
+        """Authorize with the OAuth files, or use an already built service
+        (e.g. one built over googleapiclient.http.HttpMock for offline tests)."""
         self.creds_file = creds_file
         self.token_file = token_file
-        self.service = None
-        self.user_email = None
-        self._initialize()
+        self.service = service
+        self.user_email = user_email
+        if service is None:
+            self._initialize()
+        else:
+            self.transport = gmail_transport.GmailTransport()
+            if user_email is None:
+                self.user_email = self.transport.execute(self.service.users().getProfile(userId='me')).get('emailAddress', '')
     
     def _initialize(self):
         """Initialize Gmail API service"""
@@ -60,156 +105,358 @@ class GmailService:
                 creds = flow.run_local_server(port=0)
             
             # Save the credentials for next run
-            with open(self.token_file, 'w') as token:
-                token.write(creds.to_json())
-                logger.info(f"Token saved to {self.token_file}")
+            self._save_token(creds)
+        
+        # Build the service from the cached discovery document (no discovery request)
+        document = load_discovery_document()
+        if API_ENDPOINT:
+            document = {**document, "rootUrl": API_ENDPOINT.rstrip("/") + "/"}
+        self.service = build_from_document(document, credentials=creds)
         
-        # Build the service
-        self.service = build('gmail', 'v1', credentials=creds)
+        # Requests run on the transport's worker threads, each with its own connection
+        self.transport = gmail_transport.GmailTransport(creds, on_refresh=self._save_token)
         
-        # Get user email
-        profile = self.service.users().getProfile(userId='me').execute()
-        self.user_email = profile.get('emailAddress', '')
+        # Get user email, from the cache next to the token when it belongs to these credentials
+        account = hashlib.sha256(f"{creds.client_id}:{creds.refresh_token}".encode()).hexdigest()
+        self.user_email = self._cached_email(account)
+        if self.user_email is None:
+            profile = self.transport.execute(self.service.users().getProfile(userId='me'))
+            self.user_email = profile.get('emailAddress', '')
+            self._save_email(account, self.user_email)
         logger.info(f"Gmail service initialized for {self.user_email}")
     
-    def send_email(self, recipient: str, subject: str, body: str) -> dict:
-        """Send an email"""
+    def _save_token(self, creds):
+        """Write the (new or refreshed) credentials to the token file"""
+        with open(self.token_file, 'w') as token:
+            token.write(creds.to_json())
+            logger.info(f"Token saved to {self.token_file}")
+    
+    def _cached_email(self, account: str) -> str | None:
         try:
-            message = EmailMessage()
-            message.set_content(body)
-            message['To'] = recipient
-            message['From'] = self.user_email
-            message['Subject'] = subject
-            
-            # Encode the message
-            encoded_message = base64.urlsafe_b64encode(message.as_bytes()).decode()
-            create_message = {'raw': encoded_message}
-            
-            # Send the message
-            send_result = self.service.users().messages().send(
-                userId="me", 
-                body=create_message
-            ).execute()
-            
-            logger.info(f"Email sent successfully. Message ID: {send_result['id']}")
-            return {
-                "status": "success",
-                "message_id": send_result['id'],
-                "from": self.user_email,
-                "to": recipient
-            }
+            with open(PROFILE_FILE) as f:
+                profile = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if profile.get("account") != account:
+            return None
+        return profile.get("email_address")
+    
+    def _save_email(self, account: str, email_address: str) -> None:
+        try:
+            with open(PROFILE_FILE, 'w') as f:
+                json.dump({"account": account, "email_address": email_address}, f)
+        except OSError as e:
+            logger.warning(f"Could not cache the profile in {PROFILE_FILE}: {e}")
+    
+    def _create_message(self, recipient: str, subject: str, body: str) -> dict:
+        """Request body for messages().send(): the encoded RFC 2822 message"""
+        message = EmailMessage()
+        message.set_content(body)
+        message['To'] = recipient
+        message['From'] = self.user_email
+        message['Subject'] = subject
+        return {'raw': base64.urlsafe_b64encode(message.as_bytes()).decode()}
+    
+    def deliver(self, recipient: str, subject: str, body: str, attachments: list[str] | None = None) -> str:
+        """Send an email and return its message ID (errors are raised).
+        
+        attachments are file paths or result:// handles; such messages are
+        streamed through a resumable upload (see _upload_message).
+        Blocking: call it on a transport worker, e.g. await self.transport.run(self.deliver, ...)
+        """
+        if attachments:
+            return self._upload_message(recipient, subject, body, attachments)
+        create_message = self._create_message(recipient, subject, body)
+        
+        # Send the message
+        send_result = self.transport.execute(self.service.users().messages().send(
+            userId="me", 
+            body=create_message
+        ))
+        return send_result['id']
+    
+    def _upload_message(self, recipient: str, subject: str, body: str, attachments: list[str]) -> str:
+        """Send a message with attachments as message/rfc822 media.
+        
+        The MIME message is written to a temporary file and uploaded from it
+        in UPLOAD_CHUNK_BYTES chunks, so memory use does not grow with the
+        attachments, and a dropped connection resumes the upload where it stopped.
+        """
+        with tempfile.TemporaryFile() as message_file:
+            size = gmail_mime.write_message(message_file, self.user_email, recipient, subject, body, attachments)
+            message_file.seek(0)
+            logger.info(f"Uploading a {size:,} byte message with {len(attachments)} attachment(s)")
+            media = MediaIoBaseUpload(message_file, mimetype='message/rfc822', chunksize=UPLOAD_CHUNK_BYTES,
+                                      resumable=True)
+            send_result = self.transport.upload(
+                self.service.users().messages().send(userId="me", body={}, media_body=media)
+            )
+        return send_result['id']
+    
+    def send_emails_batch(self, messages: list[tuple[str, str, str]], batch_size: int = MAX_BATCH_SIZE) -> list[dict]:
+        """Send (recipient, subject, body) messages, batch_size per batch HTTP request.
+        
+        Returns one status per message in input order: {"status": "success",
+        "message_id", "to"} or {"status": "error", "error", "to"}. A failed
+        message does not stop the others in its batch. Errors worth retrying
+        (rate limits, server and transport errors) carry "retry_in", the
+        seconds to wait before the next attempt.
+        """
+        results = [None] * len(messages)
+        
+        def on_response(request_id, response, exception):
+            index = int(request_id)
+            recipient = messages[index][0]
+            if exception is not None:
+                results[index] = _error_item(recipient, exception)
+            else:
+                results[index] = {"status": "success", "message_id": response['id'], "to": recipient}
         
-        except HttpError as error:
-            logger.error(f"Gmail API error: {error}")
-            return {
-                "status": "error",
-                "error": str(error)
-            }
-        except Exception as e:
-            logger.error(f"Error sending email: {e}")
-            return {
-                "status": "error",
-                "error": str(e)
-            }
+        for start in range(0, len(messages), batch_size):
+            indexes = range(start, min(start + batch_size, len(messages)))
+            batch = self.service.new_batch_http_request(callback=on_response)
+            for index in indexes:
+                recipient, subject, body = messages[index]
+                try:
+                    create_message = self._create_message(recipient, subject, body)
+                except Exception as e:
+                    results[index] = {"status": "error", "error": str(e), "to": recipient}
+                    continue
+                batch.add(self.service.users().messages().send(userId="me", body=create_message),
+                          request_id=str(index))
+            try:
+                self.transport.execute(batch)
+            except Exception as e:
+                # the whole batch request failed (transport error, malformed response)
+                logger.error(f"Gmail batch request failed: {e}")
+                for index in indexes:
+                    if results[index] is None:
+                        results[index] = _error_item(messages[index][0], e)
+        
+        sent = sum(result["status"] == "success" for result in results)
+        logger.info(f"Batch send finished: {sent}/{len(messages)} sent")
+        return results
+
+def _error_item(recipient: str, error: Exception) -> dict:
+    """A failed send_emails_batch item, with "retry_in" if the error is worth retrying"""
+    item = {"status": "error", "error": str(error), "to": recipient}
+    if gmail_outbox.is_retryable(error):
+        item["retry_in"] = gmail_outbox.retry_after(error) or gmail_outbox.backoff_delay(1)
+    return item
+
+_discovery_document = None
+
+def load_discovery_document() -> dict:
+    """The Gmail v1 discovery document, parsed once per process.
+    
+    Read from DISCOVERY_FILE; on first use the file is written from the copy
+    packaged with google-api-python-client, or downloaded if there is none.
+    """
+    global _discovery_document
+    if _discovery_document is not None:
+        return _discovery_document
+    try:
+        with open(DISCOVERY_FILE) as f:
+            _discovery_document = json.load(f)
+        return _discovery_document
+    except (OSError, ValueError):
+        pass
+    content = discovery_cache.get_static_doc('gmail', 'v1')
+    if content is None:
+        import httplib2
+        logger.info("Downloading the Gmail discovery document")
+        resp, content = httplib2.Http().request(V2_DISCOVERY_URI.format(api='gmail', apiVersion='v1'))
+        if resp.status >= 300:
+            raise HttpError(resp, content)
+    _discovery_document = json.loads(content)
+    try:
+        with open(DISCOVERY_FILE, 'w') as f:
+            json.dump(_discovery_document, f)
+    except OSError as e:
+        logger.warning(f"Could not cache the discovery document in {DISCOVERY_FILE}: {e}")
+    return _discovery_document
 
 # Initialize Gmail service
 gmail_service = None
+_init_lock = threading.Lock()
 
 def init_gmail_service():
-    """Initialize the Gmail service"""
+    """Initialize the Gmail service (once; concurrent callers wait for the first)"""
     global gmail_service
+    with _init_lock:
+        if gmail_service is None:
+            try:
+                gmail_service = GmailService(CREDENTIALS_FILE, TOKEN_FILE)
+                logger.info(f"✓ Gmail service initialized for: {gmail_service.user_email}")
+            except Exception as e:
+                logger.error(f"✗ Failed to initialize Gmail service: {e}")
+                raise
+
+def warm_up_gmail_service():
+    """init_gmail_service for the background warmup: failures are left to the first send to report"""
+    try:
+        init_gmail_service()
+    except Exception as e:
+        logger.warning(f"Gmail service not initialized: {e}")
+        logger.warning("Will attempt to initialize when first email is sent.")
+
+async def get_gmail_service() -> GmailService:
+    """The initialized Gmail service, waiting for a warmup still in progress"""
     if gmail_service is None:
-        try:
-            gmail_service = GmailService(CREDENTIALS_FILE, TOKEN_FILE)
-            print(f"✓ Gmail service initialized for: {gmail_service.user_email}")
-        except Exception as e:
-            print(f"✗ Failed to initialize Gmail service: {e}")
-            raise
+        await asyncio.to_thread(init_gmail_service)
+    return gmail_service
+
+# ------------------------------------------------
+# OUTBOX
+# ------------------------------------------------
+
+async def _deliver(row) -> str:
+    """Send one outbox message on a Gmail transport worker"""
+    service = await get_gmail_service()
+    attachments = json.loads(row["attachments"]) if row["attachments"] else None
+    return await service.transport.run(service.deliver, row["recipient"], row["subject"], row["body"], attachments)
+
+outbox = gmail_outbox.Outbox()
+sender = gmail_outbox.OutboxSender(outbox, _deliver, concurrency=gmail_transport.SEND_WORKERS)
 
 # ------------------------------------------------
 # MCP TOOLS
 # ------------------------------------------------
 
 @mcp.tool()
-async def send_email(recipient: str, subject: str, body: str) -> dict:
+async def send_email(recipient: str, subject: str, body: str, attachments: list[str] | None = None) -> dict:
     """Send an email with the calculation results.
     
+    The email is queued and sent in the background (retried if Gmail is
+    rate limiting or unavailable); check delivery with get_send_status.
+    
     Args:
         recipient: Email address to send to (e.g., user@example.com)
         subject: Email subject line
         body: Email body content (the final answer)
+        attachments: Optional file paths or result handles (result://...) to attach
     
     Example: send_email|user@example.com|Calculation Result|The final answer is 42
     """
-    print("\n" + "="*60)
-    print(f"SEND_EMAIL CALLED")
-    print(f"To: {recipient}")
-    print(f"Subject: {subject}")
-    print(f"Body: {body}")
-    print("="*60)
+    # stdout carries the MCP stdio session, so the trace goes to the log (stderr)
+    logger.info(f"send_email called: to={recipient} subject={subject!r} body={body!r}"
+                + (f" attachments={', '.join(attachments)}" if attachments else ""))
     
     try:
-        if gmail_service is None:
-            init_gmail_service()
-        
-        result = gmail_service.send_email(recipient, subject, body)
-        
-        if result["status"] == "success":
-            response_text = (
-                f"✓ Email sent successfully!\n"
-                f"From: {result['from']}\n"
-                f"To: {result['to']}\n"
-                f"Message ID: {result['message_id']}"
-            )
-            print(f"\n[SUCCESS] {response_text}")
-        else:
-            response_text = f"✗ Failed to send email: {result['error']}"
-            print(f"\n[ERROR] {response_text}")
-        
-        print("="*60 + "\n")
+        if attachments:
+            await asyncio.to_thread(gmail_mime.check_attachments, attachments)
+        queue_id = await asyncio.to_thread(outbox.enqueue, recipient, subject, body, attachments)
+        sender.notify()
         
-        return {
-            "content": [
-                TextContent(
-                    type="text",
-                    text=response_text
-                )
-            ]
-        }
+        response_text = (
+            f"✓ Email queued for sending!\n"
+            f"To: {recipient}\n"
+            f"Queue ID: {queue_id}\n"
+            f"Check delivery with get_send_status|{queue_id}"
+        )
+        logger.info(f"Email to {recipient} queued as {queue_id}")
     
     except Exception as e:
-        error_msg = f"Error sending email: {str(e)}"
-        print(f"\n[ERROR] {error_msg}")
-        print("="*60 + "\n")
-        import traceback
-        traceback.print_exc()
-        
-        return {
-            "content": [
-                TextContent(
-                    type="text",
-                    text=error_msg
-                )
-            ]
-        }
+        response_text = f"Error queueing email: {str(e)}"
+        logger.exception(response_text)
+    
+    return {
+        "content": [
+            TextContent(
+                type="text",
+                text=response_text
+            )
+        ]
+    }
+
+@mcp.tool()
+async def get_send_status(queue_id: int) -> dict:
+    """Delivery status of an email queued by send_email.
+    
+    Returns {"queue_id", "to", "subject", "status", "attempts", ...} where status
+    is queued, sending, sent (with "message_id") or failed (with "error").
+    """
+    status = await asyncio.to_thread(outbox.status, queue_id)
+    if status is None:
+        raise ValueError(f"Unknown queue id: {queue_id}")
+    return status
+
+def _message_fields(item) -> tuple[str, str, str]:
+    """(recipient, subject, body) from a {"recipient", "subject", "body"} object or a 3-item list"""
+    if isinstance(item, dict):
+        try:
+            return str(item["recipient"]), str(item["subject"]), str(item["body"])
+        except KeyError as e:
+            raise ValueError(f"Message is missing {e}") from None
+    if isinstance(item, (list, tuple)) and len(item) == 3:
+        return tuple(str(field) for field in item)
+    raise ValueError("Each message must be {\"recipient\", \"subject\", \"body\"} or [recipient, subject, body]")
+
+@mcp.tool()
+async def send_emails_batch(messages: list[dict | list]) -> dict:
+    """Send many emails at once, grouped into Gmail batch HTTP requests.
+    
+    Sends share send_email's rate limit. Messages Gmail rejects for rate
+    limiting or a temporary failure are queued and retried in the background
+    like send_email's; check them with get_send_status.
+    
+    Args:
+        messages: List of {"recipient", "subject", "body"} objects
+            (or [recipient, subject, body] lists)
+    
+    Returns {"total", "sent", "queued", "failed", "items"} with one {"to",
+    "status", "message_id", "queue_id" or "error"} item per message, in order;
+    status is success, queued or error.
+    
+    Example: send_emails_batch|[{"recipient": "a@example.com", "subject": "Report", "body": "42"}]
+    """
+    if len(messages) > MAX_BATCH_MESSAGES:
+        raise ValueError(f"Batch too large: {len(messages)} messages (max {MAX_BATCH_MESSAGES})")
+    fields = [_message_fields(item) for item in messages]
+    
+    service = await get_gmail_service()
+    
+    items = []
+    for start in range(0, len(fields), MAX_BATCH_SIZE):
+        chunk = fields[start:start + MAX_BATCH_SIZE]
+        # every message in the batch request spends a token of the outbox sender's bucket
+        for _ in chunk:
+            await sender.bucket.acquire()
+        results = await service.transport.run(service.send_emails_batch, chunk)
+        if any("retry_in" in item for item in results):
+            sender.bucket.penalize()
+        for (recipient, subject, body), item in zip(chunk, results):
+            retry_in = item.pop("retry_in", None)
+            if retry_in is not None:
+                queue_id = await asyncio.to_thread(outbox.enqueue, recipient, subject, body, delay=retry_in)
+                item = {"status": "queued", "queue_id": queue_id, "error": item["error"], "to": recipient}
+            items.append(item)
+    if any(item["status"] == "queued" for item in items):
+        sender.notify()
+    counts = {status: sum(item["status"] == status for item in items) for status in ("success", "queued")}
+    return {
+        "total": len(items),
+        "sent": counts["success"],
+        "queued": counts["queued"],
+        "failed": len(items) - counts["success"] - counts["queued"],
+        "items": items,
+    }
+
+# ------------------------------------------------
+# INSTRUMENTATION (after every tool is registered)
+# ------------------------------------------------
+metrics = tool_metrics.instrument(mcp)
+metrics.register_gauge("gmail_outbox_depth", outbox.depth)
+profiler = tool_profiler.instrument(mcp)
 
 # ------------------------------------------------
 # MAIN
 # ------------------------------------------------
 
 if __name__ == "__main__":
-    print("="*60)
-    print("GMAIL MCP SERVER STARTING...")
-    print("="*60)
-    
-    # Initialize Gmail service on startup
-    try:
-        init_gmail_service()
-    except Exception as e:
-        print(f"Warning: Gmail service not initialized: {e}")
-        print("Will attempt to initialize when first email is sent.")
+    logger.info("Gmail MCP server starting")
     
-    # Run the MCP server
+    # Run the MCP server (the Gmail service warms up in the background, see lifespan)
     if len(sys.argv) > 1 and sys.argv[1] == "dev":
         mcp.run()
     else:
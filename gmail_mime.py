@@ -0,0 +1,102 @@
+# gmail_mime.py - Stream MIME messages with attachments to a file
+#
+# Attachments are base64-encoded block by block straight from their source
+# (a file path or a result_store handle) into the output file, so building a
+# message holds at most one block of an attachment in memory no matter how
+# large it is. The file is then uploaded as message/rfc822 media.
+
+import base64
+import mimetypes
+import os
+import tempfile
+import uuid
+from email.message import EmailMessage
+
+import result_store
+
+# Gmail's upload limit for messages.send (maxSize in the discovery document)
+MAX_MESSAGE_BYTES = 36_700_160
+
+# Bytes of an attachment encoded at a time: a multiple of 57, so every block is whole 76-character lines
+ENCODE_BLOCK_BYTES = 57 * 1024
+
+
+class AttachmentError(ValueError):
+    """An attachment is missing, unreadable or makes the message too large."""
+
+
+def attachment_name(source: str) -> str:
+    """File name shown for an attachment: the file's own name, or result-<id>.txt / .json for a handle."""
+    if source.startswith(result_store.HANDLE_PREFIX):
+        kind = result_store.store.info(source)["kind"]  # raises ResultNotFound for unknown or expired handles
+        return f"result-{source[len(result_store.HANDLE_PREFIX):][:12]}" + (".json" if kind == "items" else ".txt")
+    return os.path.basename(source)
+
+def check_attachments(sources: list[str]) -> None:
+    """Raise AttachmentError unless every source is a readable file or a live result handle."""
+    for source in sources:
+        if source.startswith(result_store.HANDLE_PREFIX):
+            try:
+                result_store.store.info(source)
+            except result_store.ResultNotFound as e:
+                raise AttachmentError(str(e)) from None
+        elif not os.path.isfile(source) or not os.access(source, os.R_OK):
+            raise AttachmentError(f"Attachment not found or not readable: {source}")
+
+def _write_headers(out, message: EmailMessage) -> None:
+    for name, value in message.items():
+        out.write(message.policy.fold_binary(name, value))
+    out.write(b"\n")
+
+def _write_base64(out, f) -> None:
+    while block := f.read(ENCODE_BLOCK_BYTES):
+        out.write(base64.encodebytes(block))
+
+def _write_attachment(out, source: str) -> None:
+    name = attachment_name(source)
+    part = EmailMessage()
+    part["Content-Type"] = mimetypes.guess_type(name)[0] or "application/octet-stream"
+    part.add_header("Content-Disposition", "attachment", filename=name)
+    part["Content-Transfer-Encoding"] = "base64"
+    _write_headers(out, part)
+    if source.startswith(result_store.HANDLE_PREFIX):
+        # spool the result first: it is assembled from chunks and needs encoding in whole blocks
+        with tempfile.TemporaryFile() as data:
+            result_store.store.copy_to(source, data)
+            data.seek(0)
+            _write_base64(out, data)
+    else:
+        with open(source, "rb") as f:
+            _write_base64(out, f)
+
+def write_message(out, sender: str, recipient: str, subject: str, body: str, attachments: list[str]) -> int:
+    """Write a multipart/mixed message (body text plus attachments) to the binary file out.
+
+    Returns the number of bytes written. Raises AttachmentError if an
+    attachment cannot be read or the message exceeds MAX_MESSAGE_BYTES.
+    """
+    boundary = f"=============={uuid.uuid4().hex}=="
+    message = EmailMessage()
+    message["To"] = recipient
+    message["From"] = sender
+    message["Subject"] = subject
+    message["MIME-Version"] = "1.0"
+    message["Content-Type"] = f'multipart/mixed; boundary="{boundary}"'
+    text = EmailMessage()
+    text.set_content(body)
+    del text["MIME-Version"]
+
+    start = out.tell()
+    _write_headers(out, message)
+    out.write(f"--{boundary}\n".encode())
+    out.write(text.as_bytes())
+    for source in attachments:
+        out.write(f"\n--{boundary}\n".encode())
+        try:
+            _write_attachment(out, source)
+        except (OSError, result_store.ResultNotFound) as e:
+            raise AttachmentError(f"Cannot attach {source}: {e}") from None
+        if out.tell() - start > MAX_MESSAGE_BYTES:
+            raise AttachmentError(f"Message exceeds Gmail's {MAX_MESSAGE_BYTES:,} byte limit")
+    out.write(f"\n--{boundary}--\n".encode())
+    return out.tell() - start
@@ -0,0 +1,308 @@
+# gmail_outbox.py - Persistent outbox for outgoing mail and its rate-limited background sender
+#
+# send_email stores the message in an SQLite outbox and returns its queue id
+# at once. OutboxSender drains the outbox in the background: a token bucket
+# keeps sends within the Gmail per-user quota, rate-limit and server errors
+# are retried with jittered exponential backoff, and queued messages survive
+# a restart. Delivery is at least once: a message whose send succeeded just
+# before the process died is sent again once its lease runs out. Several
+# processes may share one outbox file: a message is claimed by exactly one
+# of them, and a message being sent is only taken over after SEND_LEASE.
+
+import asyncio
+import json
+import logging
+import os
+import random
+import sqlite3
+import threading
+import time
+
+from googleapiclient.errors import HttpError
+
+logger = logging.getLogger(__name__)
+
+OUTBOX_FILE = os.getenv("GMAIL_OUTBOX_FILE", "gmail_outbox.sqlite3")
+
+# Gmail allows 250 quota units per user per second and messages.send costs 100
+SEND_RATE = float(os.getenv("GMAIL_SEND_RATE", 2.5))
+SEND_BURST = int(os.getenv("GMAIL_SEND_BURST", 2))
+
+# Attempts before a message is marked failed, and the retry delay bounds in seconds
+MAX_ATTEMPTS = int(os.getenv("GMAIL_SEND_MAX_ATTEMPTS", 8))
+BACKOFF_BASE = 1.0
+BACKOFF_MAX = 300.0
+
+# HTTP statuses retried; 403 is retried only for the rate-limit reasons below
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+RATE_LIMIT_REASONS = ("rateLimitExceeded", "userRateLimitExceeded")
+
+# Seconds a sent or failed message stays queryable with get_send_status
+RETENTION = float(os.getenv("GMAIL_OUTBOX_RETENTION", 7 * 24 * 3600))
+
+# Longest the sender sleeps before checking the outbox again
+POLL_INTERVAL = 5.0
+
+# Seconds after which a message still marked sending is assumed abandoned (its
+# sender died) and sent again; longer than any send, uploads and retries included
+SEND_LEASE = float(os.getenv("GMAIL_SEND_LEASE", 15 * 60))
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS outbox (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    recipient TEXT NOT NULL,
+    subject TEXT NOT NULL,
+    body TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'queued',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_attempt_at REAL NOT NULL,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL,
+    message_id TEXT,
+    error TEXT,
+    attachments TEXT
+);
+CREATE INDEX IF NOT EXISTS outbox_due ON outbox (status, next_attempt_at);
+"""
+
+# Statuses a message moves through: queued -> sending -> sent | failed (back to queued on a retry)
+PENDING_STATUSES = ("queued", "sending")
+
+
+class Outbox:
+    """Messages waiting to be sent, and the outcome of those already handled."""
+
+    def __init__(self, path: str = OUTBOX_FILE, retention: float = RETENTION, lease: float = SEND_LEASE):
+        self.path = path
+        self.lease = lease
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.row_factory = sqlite3.Row
+        with self._lock:
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.executescript(SCHEMA)
+            columns = {row["name"] for row in self._db.execute("PRAGMA table_info(outbox)")}
+            if "attachments" not in columns:
+                # outboxes created before attachment support
+                self._db.execute("ALTER TABLE outbox ADD COLUMN attachments TEXT")
+            now = time.time()
+            # a send interrupted by a crash or restart is tried again, unless another
+            # process sharing the file may still be sending it
+            self._db.execute("UPDATE outbox SET status = 'queued', updated_at = ? "
+                             "WHERE status = 'sending' AND updated_at < ?", (now, now - lease))
+            self._db.execute("DELETE FROM outbox WHERE status IN ('sent', 'failed') AND updated_at < ?",
+                             (now - retention,))
+
+    def enqueue(self, recipient: str, subject: str, body: str, attachments: list[str] | None = None,
+                delay: float = 0.0) -> int:
+        """Store a message for sending, first attempted after delay seconds; returns its queue id.
+
+        attachments (file paths or result handles) are stored as references
+        and read when the message is sent.
+        """
+        now = time.time()
+        with self._lock:
+            cursor = self._db.execute(
+                "INSERT INTO outbox (recipient, subject, body, attachments, next_attempt_at, created_at, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (recipient, subject, body, json.dumps(attachments) if attachments else None, now + delay, now, now))
+            return cursor.lastrowid
+
+    def claim(self, now: float | None = None) -> sqlite3.Row | None:
+        """Oldest message due for an attempt, marked as sending, or None.
+
+        Messages left sending for longer than the lease are due again. The
+        row is taken only if it is unchanged since it was read, so when
+        several processes share the outbox each message is claimed once.
+        """
+        now = time.time() if now is None else now
+        with self._lock:
+            while True:
+                row = self._db.execute(
+                    "SELECT * FROM outbox WHERE (status = 'queued' AND next_attempt_at <= ?) "
+                    "OR (status = 'sending' AND updated_at < ?) "
+                    "ORDER BY next_attempt_at, id LIMIT 1", (now, now - self.lease)).fetchone()
+                if row is None:
+                    return None
+                cursor = self._db.execute(
+                    "UPDATE outbox SET status = 'sending', attempts = attempts + 1, updated_at = ? "
+                    "WHERE id = ? AND status = ? AND updated_at = ?",
+                    (now, row["id"], row["status"], row["updated_at"]))
+                if cursor.rowcount == 1:
+                    return row
+                # another process claimed it between the read and the update
+
+    def next_due(self) -> float | None:
+        """Time of the earliest queued attempt, or None if nothing is queued."""
+        with self._lock:
+            return self._db.execute("SELECT MIN(next_attempt_at) FROM outbox WHERE status = 'queued'").fetchone()[0]
+
+    def mark_sent(self, queue_id: int, message_id: str) -> None:
+        self._update(queue_id, status="sent", message_id=message_id, error=None)
+
+    def mark_retry(self, queue_id: int, error: str, delay: float) -> None:
+        self._update(queue_id, status="queued", error=error, next_attempt_at=time.time() + delay)
+
+    def mark_failed(self, queue_id: int, error: str) -> None:
+        self._update(queue_id, status="failed", error=error)
+
+    def _update(self, queue_id: int, **fields) -> None:
+        fields["updated_at"] = time.time()
+        assignments = ", ".join(f"{name} = ?" for name in fields)
+        with self._lock:
+            self._db.execute(f"UPDATE outbox SET {assignments} WHERE id = ?", (*fields.values(), queue_id))
+
+    def status(self, queue_id: int) -> dict | None:
+        """Delivery state of a queued message, or None if the id is unknown."""
+        with self._lock:
+            row = self._db.execute(
+                "SELECT id, recipient, subject, attachments, status, attempts, next_attempt_at, created_at, "
+                "updated_at, message_id, error FROM outbox WHERE id = ?", (queue_id,)).fetchone()
+        if row is None:
+            return None
+        status = {"queue_id": row["id"], "to": row["recipient"], **dict(row)}
+        del status["id"], status["recipient"]
+        status["attachments"] = json.loads(row["attachments"]) if row["attachments"] else []
+        if status["status"] != "queued":
+            del status["next_attempt_at"]
+        return status
+
+    def depth(self) -> int:
+        """Messages queued or being sent."""
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM outbox WHERE status IN (?, ?)",
+                                    PENDING_STATUSES).fetchone()[0]
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
+
+
+class TokenBucket:
+    """Allows rate events per second on average with bursts of up to capacity."""
+
+    def __init__(self, rate: float = SEND_RATE, capacity: int = SEND_BURST):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = float(capacity)
+        self._updated = time.monotonic()
+
+    async def acquire(self) -> None:
+        """Wait until a token is available and take it."""
+        while True:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return
+            await asyncio.sleep((1 - self._tokens) / self.rate)
+
+    def penalize(self) -> None:
+        """Drop the remaining burst, e.g. after a rate-limit response."""
+        self._tokens = min(self._tokens, 0.0)
+
+
+def is_retryable(error: Exception) -> bool:
+    """True for rate limiting, server errors and transport failures."""
+    if isinstance(error, HttpError):
+        status = error.resp.status
+        if status in RETRY_STATUSES:
+            return True
+        return status == 403 and any(reason in str(error.content) for reason in RATE_LIMIT_REASONS)
+    return isinstance(error, (OSError, TimeoutError)) or type(error).__module__.startswith("httplib2")
+
+def retry_after(error: Exception) -> float | None:
+    """Seconds from a Retry-After header on an HttpError, if any."""
+    if isinstance(error, HttpError):
+        try:
+            return float(error.resp.get("retry-after"))
+        except (TypeError, ValueError):
+            return None
+    return None
+
+def backoff_delay(attempts: int, base: float = BACKOFF_BASE, maximum: float = BACKOFF_MAX) -> float:
+    """Exponential backoff with equal jitter: half fixed, half random."""
+    delay = min(maximum, base * 2 ** (attempts - 1))
+    return delay / 2 + random.uniform(0, delay / 2)
+
+
+class OutboxSender:
+    """Background task that sends outbox messages through deliver(row) -> message id.
+
+    Up to concurrency deliveries are awaited at once, started no faster than
+    the token bucket allows. Raising a retryable error (see is_retryable)
+    schedules another attempt, anything else fails the message.
+    """
+
+    def __init__(self, outbox: Outbox, deliver, bucket: TokenBucket | None = None,
+                 max_attempts: int = MAX_ATTEMPTS, concurrency: int = 1):
+        self.outbox = outbox
+        self.deliver = deliver
+        self.bucket = bucket or TokenBucket()
+        self.max_attempts = max_attempts
+        self.concurrency = concurrency
+        self._wakeup = asyncio.Event()
+
+    def notify(self) -> None:
+        """Wake the sender after a message was enqueued."""
+        self._wakeup.set()
+
+    async def _wait(self) -> None:
+        due = await asyncio.to_thread(self.outbox.next_due)
+        timeout = POLL_INTERVAL if due is None else min(POLL_INTERVAL, max(0.0, due - time.time()))
+        try:
+            await asyncio.wait_for(self._wakeup.wait(), timeout)
+        except TimeoutError:
+            pass
+        self._wakeup.clear()
+
+    async def send_one(self, row) -> None:
+        queue_id = row["id"]
+        attempts = row["attempts"] + 1
+        try:
+            message_id = await self.deliver(row)
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+            if is_retryable(e) and attempts < self.max_attempts:
+                delay = retry_after(e) or backoff_delay(attempts)
+                self.bucket.penalize()
+                logger.warning(f"Send {queue_id} attempt {attempts} failed, retrying in {delay:.1f}s: {error}")
+                await asyncio.to_thread(self.outbox.mark_retry, queue_id, error, delay)
+            else:
+                logger.error(f"Send {queue_id} failed after {attempts} attempt(s): {error}")
+                await asyncio.to_thread(self.outbox.mark_failed, queue_id, error)
+        else:
+            logger.info(f"Send {queue_id} delivered. Message ID: {message_id}")
+            await asyncio.to_thread(self.outbox.mark_sent, queue_id, message_id)
+
+    async def run(self) -> None:
+        """Send due messages until cancelled.
+
+        Sends still in flight when cancelled are cancelled too; their messages
+        stay 'sending' and are requeued when the outbox is next opened.
+        """
+        slots = asyncio.Semaphore(self.concurrency)
+        in_flight = set()
+
+        async def send_and_release(row) -> None:
+            try:
+                await self.send_one(row)
+            finally:
+                slots.release()
+
+        try:
+            while True:
+                await slots.acquire()
+                row = await asyncio.to_thread(self.outbox.claim)
+                if row is None:
+                    slots.release()
+                    await self._wait()
+                    continue
+                await self.bucket.acquire()
+                task = asyncio.create_task(send_and_release(row))
+                in_flight.add(task)
+                task.add_done_callback(in_flight.discard)
+        finally:
+            for task in in_flight:
+                task.cancel()
@@ -0,0 +1,135 @@
+# gmail_transport.py - Worker threads for blocking Gmail API calls, one HTTP connection each
+#
+# googleapiclient's execute() blocks on httplib2, and an httplib2.Http object
+# is not thread-safe. Calls therefore run in a bounded thread pool where every
+# worker keeps its own AuthorizedHttp (and with it a keep-alive connection)
+# around the shared credentials. Token refreshes are serialized by a lock, so
+# concurrent workers that find the token expired refresh it once.
+
+import asyncio
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import httplib2
+from google.auth.transport.requests import Request
+from google_auth_httplib2 import AuthorizedHttp
+from googleapiclient.errors import HttpError
+from googleapiclient.http import build_http
+
+# Concurrent Gmail API calls (one connection per worker)
+SEND_WORKERS = int(os.getenv("GMAIL_SEND_WORKERS", 4))
+
+# Socket timeout for API requests, in seconds
+HTTP_TIMEOUT = float(os.getenv("GMAIL_HTTP_TIMEOUT", 60))
+
+# Retries of each resumable upload chunk (5xx, 429 and dropped connections, with exponential backoff)
+UPLOAD_RETRIES = int(os.getenv("GMAIL_UPLOAD_RETRIES", 5))
+
+
+class GmailTransport:
+    """Runs API requests on worker threads with per-thread authorized connections.
+
+    Without credentials (a service built over an HttpMock, for example)
+    requests execute on the http object they were built with.
+    """
+
+    def __init__(self, credentials=None, workers: int = SEND_WORKERS, on_refresh=None,
+                 timeout: float = HTTP_TIMEOUT):
+        self.credentials = credentials
+        self.workers = workers
+        # called with the credentials after each refresh, e.g. to save the new token
+        self.on_refresh = on_refresh
+        self.timeout = timeout
+        self._local = threading.local()
+        self._refresh_lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="gmail")
+
+    def http(self) -> AuthorizedHttp | None:
+        """This thread's authorized connection."""
+        if self.credentials is None:
+            return None
+        http = getattr(self._local, "http", None)
+        if http is None:
+            # build_http() keeps 308 (resumable upload progress) from being followed as a redirect
+            connection = build_http()
+            connection.timeout = self.timeout
+            # 401s are handled in execute() so that refreshes go through the lock
+            http = AuthorizedHttp(self.credentials, http=connection, refresh_status_codes=())
+            self._local.http = http
+        return http
+
+    def refresh(self, stale_token: str | None = None) -> None:
+        """Refresh the credentials unless another thread already replaced stale_token."""
+        with self._refresh_lock:
+            if self.credentials.valid and self.credentials.token != stale_token:
+                return
+            self.credentials.refresh(Request())
+            if self.on_refresh is not None:
+                self.on_refresh(self.credentials)
+
+    def execute(self, request):
+        """request.execute() (an HttpRequest or BatchHttpRequest) on this thread's connection.
+
+        An expired token is refreshed first; a 401 refreshes it and retries once.
+        """
+        if self.credentials is None:
+            return request.execute()
+        token = self.credentials.token
+        if not self.credentials.valid:
+            self.refresh(token)
+            token = self.credentials.token
+        try:
+            return request.execute(http=self.http())
+        except HttpError as e:
+            if e.resp.status != 401:
+                raise
+        self.refresh(token)
+        return request.execute(http=self.http())
+
+    def upload(self, request, num_retries: int = UPLOAD_RETRIES):
+        """Drive a resumable media upload to completion and return the response.
+
+        next_chunk() retries 5xx and 429 responses itself. A dropped
+        connection is retried here up to num_retries times in a row: the next
+        next_chunk() asks the server how much it received and resumes from
+        there. A 401 refreshes the token once and carries on with the same upload.
+        """
+        http = None
+        token = None
+        refreshed = False
+        failures = 0
+        response = None
+        while response is None:
+            if self.credentials is not None:
+                token = self.credentials.token
+                if not self.credentials.valid:
+                    self.refresh(token)
+                http = self.http()
+            try:
+                _, response = request.next_chunk(http=http, num_retries=num_retries)
+            except HttpError as e:
+                if e.resp.status != 401 or self.credentials is None or refreshed:
+                    raise
+                self.refresh(token)
+                refreshed = True
+                continue
+            except (OSError, httplib2.HttpLib2Error):
+                failures += 1
+                if failures > num_retries:
+                    raise
+                time.sleep(random.random() * 2 ** failures)
+                continue
+            refreshed = False
+            failures = 0
+        return response
+
+    async def run(self, fn, *args):
+        """Await fn(*args) on a worker thread."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._pool, fn, *args)
+
+    def shutdown(self) -> None:
+        self._pool.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,88 @@
+# gui_worker.py - A single thread that runs blocking GUI automation commands in order
+#
+# pyautogui / pywinauto calls block (they sleep between steps) and COM-based
+# automation expects to stay on one thread. Async tools submit commands here
+# and await them, so the event loop keeps serving other requests while a
+# drawing is in progress.
+
+import asyncio
+import os
+import queue
+import threading
+from concurrent.futures import Future
+
+# Per-command timeout in seconds
+GUI_TIMEOUT = float(os.getenv("MCP_GUI_TIMEOUT", 30))
+
+
+class GuiTimeout(TimeoutError):
+    """A GUI command did not finish in time."""
+
+
+class GuiWorker:
+    """Runs submitted commands one at a time on a dedicated daemon thread."""
+
+    def __init__(self, name: str = "gui-worker", timeout: float = GUI_TIMEOUT):
+        self.name = name
+        self.timeout = timeout
+        self._queue = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def _ensure_started(self) -> None:
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._loop, name=self.name, daemon=True)
+                self._thread.start()
+
+    def _loop(self) -> None:
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            future, fn, args = item
+            # skipped if the caller gave up (timeout / cancellation) before it started
+            if not future.set_running_or_notify_cancel():
+                continue
+            try:
+                future.set_result(fn(*args))
+            except BaseException as e:
+                future.set_exception(e)
+
+    @property
+    def pending(self) -> int:
+        """Commands waiting behind the one currently running."""
+        return self._queue.qsize()
+
+    def submit(self, fn, *args) -> Future:
+        """Queue fn(*args) to run on the GUI thread."""
+        self._ensure_started()
+        future = Future()
+        self._queue.put((future, fn, args))
+        return future
+
+    async def run(self, fn, *args, timeout: float | None = None):
+        """Run fn(*args) on the GUI thread and await its result.
+
+        A command still queued when the timeout expires (or the caller is
+        cancelled) is dropped. One that is already running cannot be
+        interrupted; it finishes in the background and later commands wait
+        for it.
+        """
+        timeout = self.timeout if timeout is None else timeout
+        future = self.submit(fn, *args)
+        try:
+            return await asyncio.wait_for(asyncio.wrap_future(future), timeout)
+        except TimeoutError:
+            state = "still running" if future.running() else "dropped from the queue"
+            raise GuiTimeout(f"GUI command did not finish within {timeout:g}s ({state})") from None
+
+    def stop(self) -> None:
+        """Let the thread exit after the commands already queued."""
+        with self._lock:
+            if self._thread is not None:
+                self._queue.put(None)
+                self._thread = None
+
+
+worker = GuiWorker()
@@ -5,150 +5,367 @@ from mcp.server.fastmcp import FastMCP, Image
 from mcp.server.fastmcp.prompts import base
 from mcp.types import TextContent
 from mcp import types
-from PIL import Image as PILImage
+import asyncio
+import functools
+import inspect
+import json
 import math
 import sys
-import time
-from pywinauto.application import Application
-import win32gui
-import win32con
-from win32api import GetSystemMetrics
-import pyautogui
+from expression_compiler import compile_expression
+import bignum
+import cpu_executor
+import array_engine
+import packed
+import paint_backend
+import gui_worker
+import ui_locator
+import result_store
+import thumbnails
+from tool_cache import pure
+import tool_cache
+import tool_metrics
+import tool_profiler
 
 # instantiate an MCP server client
 mcp = FastMCP("Calculator")
 
-# Global variable for Paint application
-paint_app = None
+# Pure math tools that batch_eval may dispatch to, keyed by tool name
+MATH_TOOLS = {}
+
+# Offloaded versions of the cpu_bound math tools, used by batch_eval
+CPU_BOUND_TOOLS = {}
+
+# Upper bound on the number of operations accepted by a single batch_eval call
+MAX_BATCH_SIZE = 1000
+
+# Upper bound on the source length accepted by evaluate_expression
+MAX_EXPRESSION_LENGTH = 2000
+
+# factorial(a) up to this a runs in the server process, where bignum's factorial table is shared by every call
+FACTORIAL_INLINE_MAX = 10_000
+
+async def _report_progress(progress: float, total: float | None = None, message: str | None = None) -> None:
+    """Progress notification for the current request, if the client sent a progress token."""
+    try:
+        await mcp.get_context().report_progress(progress, total, message)
+    except ValueError:
+        pass  # called outside a request
+
+def math_tool(fn=None, *, cpu_bound: bool = False, result_bytes=None, inline=None):
+    """Register fn as an MCP tool and as a server-side dispatchable math op.
+
+    With cpu_bound=True the MCP tool runs fn in the CPU worker pool (see
+    cpu_executor.offload) so long computations do not block the event loop,
+    reports progress while it runs, and returns results too large to send
+    inline as a result_store handle for read_result. result_bytes(**arguments)
+    estimates the result size to reject oversized calls up front. Calls for
+    which inline(**arguments) is true run in the server process instead, so
+    they share its caches. batch_eval runs such ops in the pool too;
+    evaluate_expression runs whole.
+    """
+    if fn is None:
+        return functools.partial(math_tool, cpu_bound=cpu_bound, result_bytes=result_bytes, inline=inline)
+    MATH_TOOLS[fn.__name__] = fn
+    if cpu_bound:
+        CPU_BOUND_TOOLS[fn.__name__] = cpu_executor.offload(fn, result_bytes, inline=inline)
+        return offloaded_tool(fn, result_bytes, inline)
+    return mcp.tool()(fn)
+
+def offloaded_tool(fn, result_bytes=None, inline=None):
+    """Register the sync fn as an MCP tool running in the CPU worker pool; returns fn.
+
+    fn stays module-level under its own name so the workers can import it.
+    """
+    mcp.tool()(cpu_executor.offload(fn, result_bytes, progress=_report_progress, store=result_store.store,
+                                    inline=inline))
+    return fn
 
 # ------------------------------------------------
 # MATH TOOLS
 # ------------------------------------------------
-@mcp.tool()
+@math_tool
 def add(a: int, b: int) -> int: return int(a + b)
 
-@mcp.tool()
-def add_list(l: list) -> int: return sum(l)
+@math_tool
+def add_list(l: list | dict) -> int: return array_engine.reduce_array("sum", l)
 
-@mcp.tool()
+@math_tool
+def reduce_array(op: str, values: list | dict, other: list | dict | None = None, encoding: str = "list") -> int | float | list | dict:
+    """Reduce a list of numbers in one call.
+    op: sum, prod, mean, var (population), min, max, cumsum (running sums) or dot (with other).
+    Integer sums, products and dot products are exact. Lists may also be passed as packed
+    arrays {"dtype", "shape", "data"}; encoding="packed" returns cumsum the same way."""
+    return array_engine.reduce_array(op, values, other, encoding)
+
+@math_tool
 def subtract(a: int, b: int) -> int: return int(a - b)
 
-@mcp.tool()
+@math_tool
 def multiply(a: int, b: int) -> int: return int(a * b)
 
-@mcp.tool()
+@math_tool
 def divide(a: int, b: int) -> float: return float(a / b)
 
-@mcp.tool()
-def power(a: int, b: int) -> int: return int(a ** b)
+@math_tool(cpu_bound=True, result_bytes=lambda a, b, output: bignum.encoded_bytes(bignum.power_bits(a, b), output))
+@pure()
+def power(a: int, b: int, output: str = "decimal") -> int | str:
+    """a ** b. For huge results set output to "digits", "leading", "hex" or "base64"."""
+    return bignum.power(a, b, output)
 
-@mcp.tool()
+@math_tool
+def power_mod(a: int, b: int, m: int) -> int: return pow(a, b, m)
+
+@math_tool
 def sqrt(a: int) -> float: return float(a ** 0.5)
 
-@mcp.tool()
+@math_tool
 def cbrt(a: int) -> float: return float(a ** (1/3))
 
-@mcp.tool()
-def factorial(a: int) -> int: return int(math.factorial(a))
+@math_tool(cpu_bound=True, result_bytes=lambda a, output: bignum.encoded_bytes(bignum.factorial_bits(a), output),
+           inline=lambda a, output: a <= FACTORIAL_INLINE_MAX)
+@pure()
+def factorial(a: int, output: str = "decimal") -> int | str:
+    """a!. For huge results set output to "digits", "leading", "hex" or "base64"."""
+    return bignum.factorial(a, output)
 
-@mcp.tool()
+@math_tool(cpu_bound=True)
+@pure()
+def factorial_mod(a: int, m: int) -> int: return bignum.factorial_mod(a, m)
+
+@math_tool
 def log(a: int) -> float: return float(math.log(a))
 
-@mcp.tool()
+@math_tool
 def remainder(a: int, b: int) -> int: return int(a % b)
 
-@mcp.tool()
+@math_tool
 def sin(a: int) -> float: return float(math.sin(a))
 
-@mcp.tool()
+@math_tool
 def cos(a: int) -> float: return float(math.cos(a))
 
-@mcp.tool()
+@math_tool
 def tan(a: int) -> float: return float(math.tan(a))
 
-@mcp.tool()
+@math_tool
 def mine(a: int, b: int) -> int: return int(a - b - b)
 
+@math_tool
+def apply_elementwise(op: str, values: list | dict, encoding: str = "list") -> dict:
+    """Apply a unary math tool to every value in one call.
+    op: sqrt, cbrt (real cube root), log, sin, cos, tan, exp or factorial.
+    Returns {"results": [...]} in input order; values outside the op's domain
+    (e.g. log of 0) come back as null. values may be a packed array
+    {"dtype", "shape", "data"}; encoding="packed" returns results as a packed
+    float64 array with NaN for undefined values."""
+    return {"results": array_engine.apply_elementwise(op, values, {"factorial": factorial}, encoding)}
+
 # ------------------------------------------------
 # IMAGE / STRING TOOLS
 # ------------------------------------------------
 @mcp.tool()
-def create_thumbnail(image_path: str) -> Image:
-    img = PILImage.open(image_path)
-    img.thumbnail((100, 100))
-    return Image(data=img.tobytes(), format="png")
+def create_thumbnail(image_path: str, size: int = thumbnails.DEFAULT_SIZE, format: str = "png") -> Image:
+    """Thumbnail of the image at image_path fitting in size x size pixels (default 100),
+    encoded as png, jpeg or webp. Repeat calls for an unchanged file are served from cache."""
+    format = thumbnails.normalize_format(format)
+    return Image(data=thumbnails.thumbnail(image_path, size, format), format=format)
 
 @mcp.tool()
-def strings_to_chars_to_int(string: str) -> list[int]:
+async def create_thumbnails(paths: str | list[str], size: int = thumbnails.DEFAULT_SIZE, format: str = "png",
+                            recursive: bool = False) -> dict:
+    """Thumbnail many images at once: paths is a directory (its image files; set recursive
+    to include subdirectories) or a list of image files. Uncached images are rendered in
+    parallel worker processes; images with a valid cached thumbnail are skipped.
+    Returns a manifest {"total", "created", "cached", "failed", "items"} with one
+    {"path", "status", "bytes" or "error"} item per image; fetch any thumbnail with
+    create_thumbnail(path, size, format), which is then served from cache. A large item
+    list comes back as a result handle for read_result."""
+    image_paths = await asyncio.to_thread(thumbnails.collect_paths, paths, recursive)
+    manifest = await thumbnails.thumbnail_many(image_paths, size, format, progress=_report_progress)
+    if tool_metrics.payload_bytes(manifest["items"]) > result_store.store.inline_bytes:
+        manifest["items"] = await asyncio.to_thread(result_store.store.put, "create_thumbnails", manifest["items"])
+    return manifest
+
+@math_tool
+def strings_to_chars_to_int(string: str, encoding: str = "list") -> list[int] | dict:
+    """Unicode code point of each character in string.
+    encoding "list": JSON list of ints; "packed": {"dtype": "<u4", "shape": [n], "data": base64}
+    holding the code points as a little-endian uint32 buffer."""
+    if encoding == "packed":
+        return packed.pack_code_points(string)
+    if encoding != "list":
+        raise ValueError(f"Unknown encoding: {encoding} (expected one of {', '.join(packed.ENCODINGS)})")
     return [ord(char) for char in string]
 
 @mcp.tool()
-def int_list_to_exponential_sum(int_list: list) -> float:
-    return sum(math.exp(i) for i in int_list)
+async def strings_to_chars_to_int_chunks(string: str, chunk_size: int = packed.CHUNK_CHARS) -> list[dict] | dict:
+    """Packed code points of string split into chunks of at most chunk_size characters.
+    Each chunk is returned as its own content item: {"dtype", "shape", "data", "offset"}.
+    For a long string the chunks come back as a result handle for read_result."""
+    chunks = packed.iter_packed_code_points(string, chunk_size)
+    if len(string) * packed.PACKED_BYTES_PER_CODE_POINT <= result_store.store.inline_bytes:
+        return list(chunks)
+    # spooled as they are encoded: one chunk in memory at a time
+    return await asyncio.to_thread(result_store.store.put, "strings_to_chars_to_int_chunks", chunks)
+
+@math_tool(cpu_bound=True)
+@pure()
+def int_list_to_exponential_sum(int_list: list | dict, mode: str = "auto", precision: int = 50) -> float | dict | str:
+    """Sum of exp(i) for i in int_list.
+    mode "auto": a float, or {"mantissa", "exponent", "log"} (sum = mantissa * 10**exponent) if it overflows;
+    "log": natural log of the sum; "exact": decimal string with `precision` significant digits."""
+    return array_engine.exponential_sum(int_list, mode, precision)
+
+def _fibonacci_page_count(n: int, offset: int, limit: int) -> int:
+    """Number of terms on the fibonacci_numbers page starting at offset."""
+    if n <= 0 or offset >= n:
+        return 0
+    return max(0, min(n, offset + min(limit, bignum.FIB_PAGE_LIMIT)) - offset)
+
+def _fibonacci_page_bytes(n: int, offset: int, limit: int) -> float:
+    count = _fibonacci_page_count(n, offset, limit)
+    return count * bignum.encoded_bytes(bignum.fibonacci_bits(offset + count - 1)) if count else 2
+
+# pages within the shared prefix of bignum.fibonacci_cache are served in the server process
+@math_tool(cpu_bound=True, result_bytes=_fibonacci_page_bytes,
+           inline=lambda n, offset, limit: offset + _fibonacci_page_count(n, offset, limit) <= bignum.fibonacci_cache.max_terms)
+@pure()
+def fibonacci_numbers(n: int, offset: int = 0, limit: int = bignum.FIB_PAGE_LIMIT) -> list:
+    """First n Fibonacci numbers, one page at a time: terms offset..offset+limit-1.
+    limit is capped at 1000; call again with a larger offset for the next page."""
+    count = _fibonacci_page_count(n, offset, limit)
+    return bignum.fibonacci_page(offset, count) if count else []
+
+@math_tool(cpu_bound=True, result_bytes=lambda n, output: bignum.encoded_bytes(bignum.fibonacci_bits(n), output))
+@pure()
+def fibonacci_nth(n: int, output: str = "decimal") -> int | str:
+    """The n-th Fibonacci number F(n) (F(0)=0, F(1)=1), computed in O(log n).
+    For huge results set output to "digits", "leading", "hex" or "base64"."""
+    return bignum.fibonacci(n, output)
+
+# ------------------------------------------------
+# BATCH / EXPRESSION TOOLS
+# ------------------------------------------------
+async def _dispatch(op: str, args) -> object:
+    """Call the math tool named op with positional (list) or keyword (dict) args.
+
+    cpu_bound tools run in the CPU worker pool with its deadline and result size limit.
+    """
+    fn = MATH_TOOLS.get(op)
+    if fn is None:
+        raise ValueError(f"Unknown op: {op}")
+    if args is None:
+        args = []
+    if isinstance(args, dict):
+        bound = inspect.signature(fn).bind(**args)
+    elif isinstance(args, list):
+        bound = inspect.signature(fn).bind(*args)
+    else:
+        bound = inspect.signature(fn).bind(args)
+    if op in CPU_BOUND_TOOLS:
+        return await CPU_BOUND_TOOLS[op](*bound.args, **bound.kwargs)
+    return fn(*bound.args, **bound.kwargs)
 
 @mcp.tool()
-def fibonacci_numbers(n: int) -> list:
-    if n <= 0:
-        return []
-    fib_sequence = [0, 1]
-    for _ in range(2, n):
-        fib_sequence.append(fib_sequence[-1] + fib_sequence[-2])
-    return fib_sequence[:n]
+async def batch_eval(operations: list[dict]) -> list[dict] | dict:
+    """Evaluate many math tool calls in one request.
+    Each operation is {"op": tool_name, "args": [positional...] or {name: value}}.
+    Returns one {"op", "result"} or {"op", "error"} record per operation, in order.
+    A large result list comes back as a result handle for read_result.
+    Example: batch_eval([{"op": "add", "args": [1, 2]}, {"op": "factorial", "args": [5]}])"""
+    if len(operations) > MAX_BATCH_SIZE:
+        raise ValueError(f"Batch too large: {len(operations)} operations (max {MAX_BATCH_SIZE})")
+    max_bytes = cpu_executor.executor.max_result_bytes
+    results = []
+    total = 0
+    for i, operation in enumerate(operations):
+        op = operation.get("op") if isinstance(operation, dict) else None
+        try:
+            if op is None:
+                raise ValueError("Operation must be an object with an 'op' key")
+            record = {"op": op, "result": await _dispatch(op, operation.get("args"))}
+        except Exception as e:
+            record = {"op": op, "error": f"{type(e).__name__}: {e}"}
+        results.append(record)
+        total += tool_metrics.payload_bytes(record)
+        # the whole batch is one response: the limit applies to all results together
+        cpu_executor.check_result_bytes("batch_eval", total, max_bytes)
+        await _report_progress(i + 1, len(operations))
+    if total > result_store.store.inline_bytes:
+        return await asyncio.to_thread(result_store.store.put, "batch_eval", results)
+    return results
+
+def _exp(x):
+    """Elementwise exp for lists, plain exp for scalars (expression helper)."""
+    if isinstance(x, list):
+        return [math.exp(i) for i in x]
+    return math.exp(x)
+
+def _expression_functions() -> dict:
+    """Function table visible to evaluate_expression: math tools plus short aliases."""
+    return {
+        **MATH_TOOLS,
+        "sum": add_list,
+        "exp": _exp,
+        "ord_list": strings_to_chars_to_int,
+    }
+
+@functools.lru_cache(maxsize=256)
+def _compiled_expression(expression: str):
+    return compile_expression(expression, _expression_functions())
+
+@offloaded_tool
+@pure()
+def evaluate_expression(expression: str) -> dict:
+    """Evaluate an arithmetic expression over the math tools in a single call.
+    Supports tool calls, + - * / // % **, lists, string/number literals, and
+    named intermediates: `codes = ord_list("INDIA"); sum(exp(codes))`.
+    Aliases: sum=add_list, exp=elementwise exp, ord_list=strings_to_chars_to_int.
+    Returns {"result": value, "intermediates": {name: value}}.
+    Example: evaluate_expression('factorial(5) + power(2, 10)')"""
+    if len(expression) > MAX_EXPRESSION_LENGTH:
+        raise ValueError(f"Expression too long: {len(expression)} characters (max {MAX_EXPRESSION_LENGTH})")
+    return _compiled_expression(expression)()
 
 # ------------------------------------------------
-# PAINT AUTOMATION TOOLS
+# RESULT HANDLES
 # ------------------------------------------------
 @mcp.tool()
-async def open_paint_and_select_rectangle(rect_tool_x: int, rect_tool_y: int) -> dict:
-    """Open Paint, maximize, and select rectangle tool correctly."""
-    global paint_app
+def read_result(handle: str, chunk: int = 0) -> dict:
+    """Read one chunk of a large result that a tool returned as
+    {"handle": "result://...", "chunks": n, ...}. Chunks are numbered 0..n-1.
+    Returns {"handle", "chunk", "chunks", "data"}: data is a slice of the items
+    for list results, otherwise the next slice of the result text."""
+    return result_store.store.read(handle, chunk)
+
+# ------------------------------------------------
+# PAINT AUTOMATION TOOLS
+# ------------------------------------------------
+async def _paint_result(action) -> dict:
+    """Run action(backend) on the GUI worker thread and wrap its message, or the failure, as text content.
+
+    The backend is loaded and driven only from that thread, so blocking GUI
+    steps never stall the event loop.
+    """
     try:
-        if paint_app is None:
-            paint_app = Application().start('mspaint.exe')
-            time.sleep(1)
-
-            # Get Paint window
-            paint_window = paint_app.window(title_re=".*Paint.*")
-            win32gui.SetWindowPos(paint_window.handle, win32con.HWND_TOP, 0, 0, 0, 0, win32con.SWP_NOSIZE)
-            win32gui.ShowWindow(paint_window.handle, win32con.SW_MAXIMIZE)
-            time.sleep(1)
-
-        # Click rectangle shape dropdown if necessary (adjust coordinates!)
-        # pyautogui.click(rect_tool_x, rect_tool_y) may not always select rectangle
-        # Sometimes you need to click twice or drag to select correct shape
-        pyautogui.moveTo(rect_tool_x, rect_tool_y)
-        pyautogui.click()
-        time.sleep(0.2)
-        pyautogui.click()  # double-click to ensure rectangle selected
-        time.sleep(0.2)
-
-        # Optional: click inside canvas to ensure focus
-        pyautogui.click(400, 400)
-
-        primary_width = GetSystemMetrics(0)
-        primary_height = GetSystemMetrics(1)
-
-        return {
-            "content": [TextContent(
-                type="text",
-                text=f"Paint opened ({primary_width}x{primary_height}) and rectangle tool selected at ({rect_tool_x},{rect_tool_y})"
-            )]
-        }
+        text = await gui_worker.worker.run(lambda: action(paint_backend.get_backend()))
+    except paint_backend.BackendUnavailable as e:
+        text = f"Unavailable: {e}"
     except Exception as e:
-        return {"content": [TextContent(type="text", text=f"Error: {str(e)}")]}
+        text = f"Error: {str(e)}"
+    return {"content": [TextContent(type="text", text=text)]}
+
+@mcp.tool()
+async def open_paint_and_select_rectangle(rect_tool_x: int | None = None, rect_tool_y: int | None = None) -> dict:
+    """Open Paint, maximize, and select rectangle tool correctly.
+    Without coordinates the rectangle tool is located on screen automatically."""
+    return await _paint_result(lambda backend: backend.open_and_select_rectangle(rect_tool_x, rect_tool_y))
 
 
 @mcp.tool()
 async def draw_rectangle(x1: int, y1: int, x2: int, y2: int) -> dict:
     """Draw a rectangle in Paint using pyautogui drag."""
-    try:
-        pyautogui.moveTo(x1, y1)
-        pyautogui.mouseDown()
-        pyautogui.moveTo(x2, y2, duration=0.5)
-        pyautogui.mouseUp()
-        return {"content": [TextContent(type="text", text=f"Rectangle drawn from ({x1},{y1}) to ({x2},{y2})")]}
-    except Exception as e:
-        return {"content": [TextContent(type="text", text=f"Error: {str(e)}")]}
+    return await _paint_result(lambda backend: backend.draw_rectangle(x1, y1, x2, y2))
 
 # @mcp.tool()
 # async def add_text_in_paint(text: str, text_tool_x: int, text_tool_y: int, text_box_x1: int, text_box_y1: int, text_box_x2: int, text_box_y2: int) -> dict:
@@ -212,64 +429,47 @@ async def draw_rectangle(x1: int, y1: int, x2: int, y2: int) -> dict:
 @mcp.tool()
 async def add_text_in_paint(text: str) -> dict:
     """Add text in Paint at a fixed canvas location"""
-    global paint_app
+    return await _paint_result(lambda backend: backend.add_text(text))
+
+@mcp.tool()
+async def draw_batch(primitives: list[dict]) -> dict:
+    """Draw many shapes in one call, in order. Each primitive is
+    {"type": "rectangle" | "ellipse" | "line", "x1", "y1", "x2", "y2"} or {"type": "text", "text", "x", "y"},
+    with optional outline, fill, color and width. The Windows Paint backend supports rectangle and text only.
+    Example: draw_batch([{"type": "rectangle", "x1": 100, "y1": 100, "x2": 700, "y2": 400}, {"type": "text", "text": "42"}])"""
+    return await _paint_result(lambda backend: backend.draw_batch(primitives))
+
+@mcp.tool(structured_output=False)
+async def get_canvas() -> Image | dict:
+    """The current drawing as a PNG image (a desktop screenshot with the Windows Paint backend)."""
     try:
-        if not paint_app:
-            return {
-                "content": [
-                    TextContent(
-                        type="text",
-                        text="Paint is not open. Please call open_paint first."
-                    )
-                ]
-            }
-
-        # Get the Paint window
-        paint_window = paint_app.window(class_name='MSPaintApp')
-
-        # Ensure Paint window is active
-        if not paint_window.has_focus():
-            paint_window.set_focus()
-            time.sleep(0.5)
-
-        # Select the Text tool (shortcut 'T')
-        paint_window.type_keys('t')
-        time.sleep(0.5)
-
-        # Click on the canvas to create a text box
-        # Adjust coordinates as needed for your screen resolution
-        canvas_x, canvas_y = 500, 500
-        paint_window.click_input(coords=(canvas_x, canvas_y))
-        time.sleep(0.5)
-
-        # Type the text
-        paint_window.type_keys(text, pause=0.05)
-        time.sleep(0.5)
-
-        # Click outside the text box to finish editing
-        paint_window.click_input(coords=(canvas_x + 200, canvas_y + 200))
-        time.sleep(0.2)
-
-        return {
-            "content": [
-                TextContent(
-                    type="text",
-                    text=f"Text:'{text}' added successfully at ({canvas_x},{canvas_y})"
-                )
-            ]
-        }
+        data = await gui_worker.worker.run(lambda: paint_backend.get_backend().snapshot())
+    except paint_backend.BackendUnavailable as e:
+        return {"content": [TextContent(type="text", text=f"Unavailable: {e}")]}
+    return Image(data=data, format="png")
 
-    except Exception as e:
-        import traceback
-        traceback.print_exc()
-        return {
-            "content": [
-                TextContent(
-                    type="text",
-                    text=f"Error: {str(e)}"
-                )
-            ]
-        }
+@mcp.tool()
+async def locate_ui_element(template: str, min_score: float = ui_locator.MIN_SCORE) -> dict:
+    """Find a UI element on the current screen (or canvas) by template matching.
+    template is a PNG path or the name of a template in the ui_templates directory.
+    Returns {"found": true, "x", "y", "score", "scale", "box", "cached"} with (x, y) the
+    element's center, or {"found": false}."""
+    try:
+        screenshot = await gui_worker.worker.run(lambda: paint_backend.get_backend().screenshot())
+    except paint_backend.BackendUnavailable as e:
+        return {"content": [TextContent(type="text", text=f"Unavailable: {e}")]}
+    match = await asyncio.to_thread(ui_locator.locator.locate, screenshot, template, min_score=min_score)
+    return {"found": True, **match} if match else {"found": False}
+
+@mcp.tool()
+async def save_canvas(path: str) -> dict:
+    """Save the current drawing as a PNG file at path."""
+    def save(backend) -> str:
+        data = backend.snapshot()
+        with open(path, "wb") as f:
+            f.write(data)
+        return f"Canvas saved to {path} ({len(data):,} bytes)"
+    return await _paint_result(save)
 
 
 # ------------------------------------------------
@@ -279,6 +479,12 @@ async def add_text_in_paint(text: str) -> dict:
 def get_greeting(name: str) -> str:
     return f"Hello, {name}!"
 
+@mcp.resource("cache://stats")
+def get_cache_stats() -> str:
+    """Hit/miss/eviction counters and sizes of every pure tool cache, the thumbnail caches and the UI locator."""
+    return json.dumps({**tool_cache.stats(), "thumbnails_disk": thumbnails.disk_cache.stats(),
+                       "ui_locator": ui_locator.locator.stats()}, indent=2)
+
 @mcp.prompt()
 def review_code(code: str) -> str:
     return f"Please review this code:\n\n{code}"
@@ -291,6 +497,12 @@ def debug_error(error: str) -> list[base.Message]:
         base.AssistantMessage("I'll help debug that. What have you tried so far?"),
     ]
 
+# ------------------------------------------------
+# INSTRUMENTATION (after every tool is registered)
+# ------------------------------------------------
+metrics = tool_metrics.instrument(mcp)
+profiler = tool_profiler.instrument(mcp)
+
 # ------------------------------------------------
 if __name__ == "__main__":
     print("STARTING THE SERVER...")
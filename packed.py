@@ -0,0 +1,84 @@
+# packed.py - Compact binary encoding for array tool arguments and results
+
+import base64
+
+import numpy as np
+
+# Code points travel as little-endian uint32, which is exactly the UTF-32-LE layout
+CODE_POINT_DTYPE = "<u4"
+
+# Characters per chunk for chunked code point results
+CHUNK_CHARS = 64 * 1024
+
+# Encoded size of one packed code point: 4 bytes, base64-encoded
+PACKED_BYTES_PER_CODE_POINT = 4 * 4 / 3
+
+# Array kinds that may travel packed: bool, signed/unsigned int, float
+PACKABLE_KINDS = "biuf"
+
+ENCODINGS = ("list", "packed")
+
+
+def pack_buffer(dtype: str, buffer, length: int) -> dict:
+    """Wrap a little-endian buffer as {"dtype", "shape", "data"} with base64 data."""
+    return {
+        "dtype": dtype,
+        "shape": [length],
+        "data": base64.b64encode(buffer).decode("ascii"),
+    }
+
+def pack_code_points(string: str) -> dict:
+    """Code points of string as a packed uint32 array.
+
+    The buffer comes straight from the UTF-32-LE codec, so no per-character
+    Python objects are created. Lone surrogates are passed through as-is.
+    """
+    return pack_buffer(CODE_POINT_DTYPE, string.encode("utf-32-le", "surrogatepass"), len(string))
+
+def iter_packed_code_points(string: str, chunk_chars: int = CHUNK_CHARS):
+    """Yield packed code point chunks of at most chunk_chars characters.
+
+    Each chunk is encoded independently and carries its character offset,
+    so a consumer that handles one chunk at a time (result_store.put, for
+    one) holds one encoded chunk rather than the whole encoded string.
+    """
+    if chunk_chars <= 0:
+        raise ValueError("chunk_chars must be positive")
+    for start in range(0, len(string), chunk_chars):
+        chunk = pack_code_points(string[start:start + chunk_chars])
+        chunk["offset"] = start
+        yield chunk
+
+
+def is_packed(value) -> bool:
+    """True if value looks like a packed array ({"dtype", "data", ...})."""
+    return isinstance(value, dict) and "dtype" in value and "data" in value
+
+def pack_array(array) -> dict:
+    """Pack a numeric array as {"dtype", "shape", "data"} with a little-endian buffer."""
+    array = np.asarray(array)
+    if array.dtype.kind not in PACKABLE_KINDS:
+        raise ValueError(f"Cannot pack {array.dtype} values; use encoding='list'")
+    array = np.ascontiguousarray(array, dtype=array.dtype.newbyteorder("<"))
+    return {
+        "dtype": array.dtype.str,
+        "shape": list(array.shape),
+        "data": base64.b64encode(array.data).decode("ascii"),
+    }
+
+def unpack_array(value: dict) -> np.ndarray:
+    """Decode a packed array without any per-element work (read-only view over the buffer)."""
+    dtype = np.dtype(value["dtype"])
+    if dtype.kind not in PACKABLE_KINDS:
+        raise ValueError(f"Unsupported packed dtype: {value['dtype']}")
+    array = np.frombuffer(base64.b64decode(value["data"]), dtype=dtype)
+    shape = value.get("shape")
+    return array.reshape(shape) if shape is not None else array
+
+def encode_array(array, encoding: str = "list"):
+    """Return array as a JSON list or as a packed array, per encoding."""
+    if encoding == "packed":
+        return pack_array(array)
+    if encoding != "list":
+        raise ValueError(f"Unknown encoding: {encoding} (expected one of {', '.join(ENCODINGS)})")
+    return np.asarray(array).tolist()
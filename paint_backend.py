@@ -0,0 +1,338 @@
+# paint_backend.py - Paint automation backends, imported on the first Paint tool call
+#
+# MCP_PAINT_BACKEND selects the backend:
+#   windows - drives mspaint.exe with pywinauto / pywin32 / pyautogui
+#   canvas  - draws into an in-memory Pillow image; headless and fast
+#   auto    - windows on Windows, canvas elsewhere (default)
+#   fake    - records commands and sleeps MCP_FAKE_PAINT_DELAY seconds per
+#             command, standing in for the GUI in tests and benchmarks
+#
+# The Windows GUI libraries are slow to import and missing on headless/Linux
+# hosts, so mcp_server.py never imports them at startup. get_backend() loads
+# the backend once; if that fails, every Paint tool reports the backend as
+# unavailable and the math tools keep working.
+
+import io
+import os
+import sys
+import threading
+import time
+
+PAINT_BACKEND = os.getenv("MCP_PAINT_BACKEND", "auto")
+
+# Canvas backend image size and text size, in pixels
+CANVAS_WIDTH = int(os.getenv("MCP_CANVAS_WIDTH", 1280))
+CANVAS_HEIGHT = int(os.getenv("MCP_CANVAS_HEIGHT", 800))
+CANVAS_FONT_SIZE = 32
+
+# Where add_text places text, as in the Windows backend
+TEXT_X, TEXT_Y = 500, 500
+
+# Template located on screen when open_paint_and_select_rectangle gets no coordinates
+RECT_TOOL_TEMPLATE = os.getenv("MCP_RECT_TOOL_TEMPLATE", "rectangle_tool")
+
+# Upper bound on the number of primitives accepted by a single draw_batch call
+MAX_PRIMITIVES = 1000
+
+# Seconds each fake backend command blocks, like a real GUI step would
+FAKE_PAINT_DELAY = float(os.getenv("MCP_FAKE_PAINT_DELAY", 0))
+
+
+class BackendUnavailable(RuntimeError):
+    """The Paint automation backend cannot be loaded on this host."""
+
+
+class WindowsPaintBackend:
+    """Drives mspaint.exe with pywinauto, pywin32 and pyautogui."""
+
+    def __init__(self):
+        from pywinauto.application import Application
+        import win32gui
+        import win32con
+        from win32api import GetSystemMetrics
+        import pyautogui
+
+        self._Application = Application
+        self._win32gui = win32gui
+        self._win32con = win32con
+        self._GetSystemMetrics = GetSystemMetrics
+        self._pyautogui = pyautogui
+        self.paint_app = None
+
+    def open_and_select_rectangle(self, rect_tool_x: int | None = None, rect_tool_y: int | None = None) -> str:
+        """Open Paint, maximize, and select rectangle tool correctly.
+
+        Without coordinates the rectangle tool is found on screen by matching
+        the RECT_TOOL_TEMPLATE image (see ui_locator).
+        """
+        win32gui, win32con, pyautogui = self._win32gui, self._win32con, self._pyautogui
+        if self.paint_app is None:
+            self.paint_app = self._Application().start('mspaint.exe')
+            time.sleep(1)
+
+            # Get Paint window
+            paint_window = self.paint_app.window(title_re=".*Paint.*")
+            win32gui.SetWindowPos(paint_window.handle, win32con.HWND_TOP, 0, 0, 0, 0, win32con.SWP_NOSIZE)
+            win32gui.ShowWindow(paint_window.handle, win32con.SW_MAXIMIZE)
+            time.sleep(1)
+
+        if rect_tool_x is None or rect_tool_y is None:
+            rect_tool_x, rect_tool_y = self._locate_rect_tool()
+
+        # Click rectangle shape dropdown if necessary (adjust coordinates!)
+        # pyautogui.click(rect_tool_x, rect_tool_y) may not always select rectangle
+        # Sometimes you need to click twice or drag to select correct shape
+        pyautogui.moveTo(rect_tool_x, rect_tool_y)
+        pyautogui.click()
+        time.sleep(0.2)
+        pyautogui.click()  # double-click to ensure rectangle selected
+        time.sleep(0.2)
+
+        # Optional: click inside canvas to ensure focus
+        pyautogui.click(400, 400)
+
+        primary_width = self._GetSystemMetrics(0)
+        primary_height = self._GetSystemMetrics(1)
+        return f"Paint opened ({primary_width}x{primary_height}) and rectangle tool selected at ({rect_tool_x},{rect_tool_y})"
+
+    def _locate_rect_tool(self) -> tuple[int, int]:
+        import ui_locator
+
+        try:
+            match = ui_locator.locator.locate(self.screenshot(), RECT_TOOL_TEMPLATE)
+        except FileNotFoundError:
+            raise ValueError(f"No rectangle tool template at {ui_locator.locator.template_path(RECT_TOOL_TEMPLATE)}; "
+                             f"capture one with quick_coordinate_finder.py or pass rect_tool_x and rect_tool_y") from None
+        if match is None:
+            raise ValueError(f"Rectangle tool not found on screen with template '{RECT_TOOL_TEMPLATE}'; "
+                             f"pass rect_tool_x and rect_tool_y")
+        return match["x"], match["y"]
+
+    def draw_rectangle(self, x1: int, y1: int, x2: int, y2: int) -> str:
+        """Draw a rectangle in Paint using pyautogui drag."""
+        pyautogui = self._pyautogui
+        pyautogui.moveTo(x1, y1)
+        pyautogui.mouseDown()
+        pyautogui.moveTo(x2, y2, duration=0.5)
+        pyautogui.mouseUp()
+        return f"Rectangle drawn from ({x1},{y1}) to ({x2},{y2})"
+
+    def add_text(self, text: str) -> str:
+        """Add text in Paint at a fixed canvas location"""
+        if not self.paint_app:
+            return "Paint is not open. Please call open_paint first."
+
+        # Get the Paint window
+        paint_window = self.paint_app.window(class_name='MSPaintApp')
+
+        # Ensure Paint window is active
+        if not paint_window.has_focus():
+            paint_window.set_focus()
+            time.sleep(0.5)
+
+        # Select the Text tool (shortcut 'T')
+        paint_window.type_keys('t')
+        time.sleep(0.5)
+
+        # Click on the canvas to create a text box
+        # Adjust coordinates as needed for your screen resolution
+        canvas_x, canvas_y = 500, 500
+        paint_window.click_input(coords=(canvas_x, canvas_y))
+        time.sleep(0.5)
+
+        # Type the text
+        paint_window.type_keys(text, pause=0.05)
+        time.sleep(0.5)
+
+        # Click outside the text box to finish editing
+        paint_window.click_input(coords=(canvas_x + 200, canvas_y + 200))
+        time.sleep(0.2)
+
+        return f"Text:'{text}' added successfully at ({canvas_x},{canvas_y})"
+
+    def draw_batch(self, primitives: list[dict]) -> str:
+        """Draw rectangles and text one after another through the GUI."""
+        messages = []
+        for primitive in _check_primitives(primitives, ("rectangle", "text")):
+            if primitive["type"] == "rectangle":
+                messages.append(self.draw_rectangle(primitive["x1"], primitive["y1"], primitive["x2"], primitive["y2"]))
+            else:
+                messages.append(self.add_text(primitive["text"]))
+        return f"Drew {len(messages)} primitives: " + "; ".join(messages)
+
+    def screenshot(self):
+        """The desktop showing Paint, as a PIL image."""
+        return self._pyautogui.screenshot()
+
+    def snapshot(self) -> bytes:
+        return _png(self.screenshot())
+
+
+class CanvasPaintBackend:
+    """Draws into an in-memory Pillow canvas; no GUI, no sleeps."""
+
+    def __init__(self, width: int = CANVAS_WIDTH, height: int = CANVAS_HEIGHT):
+        from PIL import Image, ImageDraw, ImageFont
+
+        self._Image = Image
+        self._ImageDraw = ImageDraw
+        self._font = ImageFont.load_default(size=CANVAS_FONT_SIZE)
+        self.width = width
+        self.height = height
+        self._lock = threading.Lock()
+        self._new_canvas()
+
+    def _new_canvas(self) -> None:
+        self.canvas = self._Image.new("RGB", (self.width, self.height), "white")
+        self._draw = self._ImageDraw.Draw(self.canvas)
+
+    def open_and_select_rectangle(self, rect_tool_x: int | None = None, rect_tool_y: int | None = None) -> str:
+        """Start a blank canvas (the tool coordinates only matter for the Windows backend)."""
+        with self._lock:
+            self._new_canvas()
+        return f"Canvas opened ({self.width}x{self.height}) and rectangle tool selected"
+
+    def _rectangle(self, x1: int, y1: int, x2: int, y2: int, outline="black", fill=None, width: int = 3) -> None:
+        box = (min(x1, x2), min(y1, y2), max(x1, x2), max(y1, y2))
+        self._draw.rectangle(box, outline=outline, fill=fill, width=width)
+
+    def _text(self, text: str, x: int = TEXT_X, y: int = TEXT_Y, color="black") -> None:
+        self._draw.text((x, y), text, fill=color, font=self._font)
+
+    def draw_rectangle(self, x1: int, y1: int, x2: int, y2: int) -> str:
+        with self._lock:
+            self._rectangle(x1, y1, x2, y2)
+        return f"Rectangle drawn from ({x1},{y1}) to ({x2},{y2})"
+
+    def add_text(self, text: str) -> str:
+        with self._lock:
+            self._text(text)
+        return f"Text:'{text}' added successfully at ({TEXT_X},{TEXT_Y})"
+
+    def draw_batch(self, primitives: list[dict]) -> str:
+        """Draw every primitive in order under one lock.
+
+        rectangle: x1, y1, x2, y2, optional outline, fill, width
+        ellipse:   x1, y1, x2, y2, optional outline, fill, width
+        line:      x1, y1, x2, y2, optional color, width
+        text:      text, optional x, y, color
+        """
+        primitives = _check_primitives(primitives, ("rectangle", "ellipse", "line", "text"))
+        with self._lock:
+            for p in primitives:
+                kind = p["type"]
+                if kind == "rectangle":
+                    self._rectangle(p["x1"], p["y1"], p["x2"], p["y2"], p.get("outline", "black"),
+                                    p.get("fill"), p.get("width", 3))
+                elif kind == "ellipse":
+                    box = (min(p["x1"], p["x2"]), min(p["y1"], p["y2"]), max(p["x1"], p["x2"]), max(p["y1"], p["y2"]))
+                    self._draw.ellipse(box, outline=p.get("outline", "black"), fill=p.get("fill"), width=p.get("width", 3))
+                elif kind == "line":
+                    self._draw.line((p["x1"], p["y1"], p["x2"], p["y2"]), fill=p.get("color", "black"), width=p.get("width", 3))
+                else:
+                    self._text(p["text"], p.get("x", TEXT_X), p.get("y", TEXT_Y), p.get("color", "black"))
+        return f"Drew {len(primitives)} primitives"
+
+    def screenshot(self):
+        """A copy of the canvas."""
+        with self._lock:
+            return self.canvas.copy()
+
+    def snapshot(self) -> bytes:
+        return _png(self.screenshot())
+
+
+class FakePaintBackend:
+    """Records every command instead of drawing; each one blocks for delay seconds."""
+
+    def __init__(self, delay: float = FAKE_PAINT_DELAY):
+        self.delay = delay
+        self.calls = []
+
+    def _record(self, *call) -> None:
+        self.calls.append(call)
+        if self.delay:
+            time.sleep(self.delay)
+
+    def open_and_select_rectangle(self, rect_tool_x: int | None = None, rect_tool_y: int | None = None) -> str:
+        self._record("open_and_select_rectangle", rect_tool_x, rect_tool_y)
+        return "Fake Paint opened and rectangle tool selected"
+
+    def draw_rectangle(self, x1: int, y1: int, x2: int, y2: int) -> str:
+        self._record("draw_rectangle", x1, y1, x2, y2)
+        return f"Rectangle drawn from ({x1},{y1}) to ({x2},{y2})"
+
+    def add_text(self, text: str) -> str:
+        self._record("add_text", text)
+        return f"Text:'{text}' added successfully at ({TEXT_X},{TEXT_Y})"
+
+    def draw_batch(self, primitives: list[dict]) -> str:
+        primitives = _check_primitives(primitives, ("rectangle", "ellipse", "line", "text"))
+        self._record("draw_batch", primitives)
+        return f"Drew {len(primitives)} primitives"
+
+    def screenshot(self):
+        """A blank 1x1 white image."""
+        from PIL import Image
+
+        self._record("screenshot")
+        return Image.new("RGB", (1, 1), "white")
+
+    def snapshot(self) -> bytes:
+        return _png(self.screenshot())
+
+
+def _png(image) -> bytes:
+    out = io.BytesIO()
+    image.save(out, "PNG")
+    return out.getvalue()
+
+def _check_primitives(primitives: list[dict], kinds: tuple[str, ...]) -> list[dict]:
+    """Validate a draw_batch list before anything is drawn."""
+    if len(primitives) > MAX_PRIMITIVES:
+        raise ValueError(f"Too many primitives: {len(primitives)} (max {MAX_PRIMITIVES})")
+    required = {"rectangle": ("x1", "y1", "x2", "y2"), "ellipse": ("x1", "y1", "x2", "y2"),
+                "line": ("x1", "y1", "x2", "y2"), "text": ("text",)}
+    for i, primitive in enumerate(primitives):
+        kind = primitive.get("type") if isinstance(primitive, dict) else None
+        if kind not in kinds:
+            raise ValueError(f"Primitive {i}: type must be one of {', '.join(kinds)}")
+        missing = [field for field in required[kind] if field not in primitive]
+        if missing:
+            raise ValueError(f"Primitive {i} ({kind}): missing {', '.join(missing)}")
+    return primitives
+
+
+BACKENDS = {"windows": WindowsPaintBackend, "canvas": CanvasPaintBackend, "fake": FakePaintBackend}
+
+_backend = None
+_load_error = None
+_lock = threading.Lock()
+
+
+def backend_name(name: str = PAINT_BACKEND) -> str:
+    """The backend MCP_PAINT_BACKEND resolves to on this host."""
+    if name == "auto":
+        return "windows" if sys.platform == "win32" else "canvas"
+    if name not in BACKENDS:
+        raise BackendUnavailable(f"Unknown paint backend: {name} (expected auto, {', '.join(BACKENDS)})")
+    return name
+
+def get_backend() -> WindowsPaintBackend | CanvasPaintBackend | FakePaintBackend:
+    """The configured Paint backend, loaded on first call.
+
+    Raises BackendUnavailable if it cannot be loaded; the failure is
+    remembered so later calls do not retry the imports.
+    """
+    global _backend, _load_error
+    with _lock:
+        if _backend is None and _load_error is None:
+            try:
+                _backend = BACKENDS[backend_name()]()
+            except BackendUnavailable as e:
+                _load_error = str(e)
+            except Exception as e:
+                _load_error = f"{type(e).__name__}: {e}"
+        if _backend is None:
+            raise BackendUnavailable(f"Paint backend could not be loaded on this host ({_load_error})")
+        return _backend
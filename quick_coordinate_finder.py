@@ -4,11 +4,21 @@ Use 'correct_coordinate_finder.py' instead for accurate window-relative coordina
 
 Quick Coordinate Finder - Simple mouse position tracker (SCREEN COORDINATES)
 Note: pywinauto uses WINDOW-RELATIVE coordinates, not screen coordinates!
+
+It can also save the Rectangle tool's icon as ui_templates/rectangle_tool.png,
+the template open_paint_and_select_rectangle matches to find the tool on
+screen when it is called without coordinates.
 """
 
 import pyautogui
 import time
 
+import paint_backend
+import ui_locator
+
+# Half the side of the square cut out around the pointer as the rectangle tool template
+TEMPLATE_HALF_SIZE = 12
+
 print("╔═══════════════════════════════════════════════════════════╗")
 print("║        Quick Mouse Position Finder                       ║")
 print("║     ⚠️  WARNING: May give wrong coordinates!             ║")
@@ -53,3 +63,13 @@ except KeyboardInterrupt:
     print(f"   python correct_coordinate_finder.py")
     print(f"{'='*60}\n")
 
+    save = input(f"Is the mouse over the Rectangle tool? Save it as the template for finding the tool? (y/n): ")
+    if save.lower() == 'y':
+        # Move the pointer off the button so it is captured without its hover highlight
+        pyautogui.moveTo(x + 4 * TEMPLATE_HALF_SIZE, y + 4 * TEMPLATE_HALF_SIZE)
+        time.sleep(0.5)
+        box = (x - TEMPLATE_HALF_SIZE, y - TEMPLATE_HALF_SIZE, x + TEMPLATE_HALF_SIZE, y + TEMPLATE_HALF_SIZE)
+        path = ui_locator.locator.save_template(pyautogui.screenshot(), box, paint_backend.RECT_TOOL_TEMPLATE)
+        print(f"✓ Rectangle tool template saved to {path}")
+        print(f"  open_paint_and_select_rectangle now finds the tool without coordinates")
+
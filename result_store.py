@@ -0,0 +1,220 @@
+# result_store.py - Spool large tool results to disk and serve them back in bounded chunks
+#
+# A tool whose result is larger than INLINE_RESULT_BYTES returns a small
+# handle instead, {"handle": "result://<id>", "chunks": n, ...}, and the
+# client pages through the data with read_result(handle, chunk). Lists are
+# split on item boundaries (each chunk's data is a JSON list); anything else
+# is stored as text and split into consecutive slices of that text.
+
+import json
+import os
+import tempfile
+import threading
+import time
+import uuid
+from collections.abc import Iterator
+
+import pydantic_core
+
+RESULT_DIR = os.getenv("MCP_RESULT_DIR", os.path.join(tempfile.gettempdir(), "mcp_results"))
+
+# Results up to this many serialized bytes are returned inline
+INLINE_RESULT_BYTES = int(os.getenv("MCP_INLINE_RESULT_BYTES", 256 * 1024))
+
+# Upper bound on the data in one chunk (a single list item may exceed it)
+CHUNK_BYTES = int(os.getenv("MCP_RESULT_CHUNK_BYTES", 64 * 1024))
+
+# Seconds a spooled result stays readable
+RESULT_TTL = float(os.getenv("MCP_RESULT_TTL", 3600))
+
+HANDLE_PREFIX = "result://"
+
+
+class ResultNotFound(KeyError):
+    """The handle is unknown or its result has expired."""
+
+    def __str__(self):
+        return f"Unknown or expired result handle: {self.args[0]}"
+
+
+def _text(value) -> str:
+    """Text form of a non-list result: strings as-is, anything else as JSON."""
+    if isinstance(value, str):
+        return value
+    return pydantic_core.to_json(value, fallback=str).decode("utf-8")
+
+def _item_chunks(items, chunk_bytes: int, counter: list):
+    """Split items (any iterable) into JSON lists of at most chunk_bytes each
+    (at least one item per chunk); counter[0] counts the items consumed."""
+    chunk, size = [], 2
+    for item in items:
+        counter[0] += 1
+        encoded = pydantic_core.to_json(item, fallback=str)
+        if chunk and size + len(encoded) + 1 > chunk_bytes:
+            yield b"[" + b",".join(chunk) + b"]"
+            chunk, size = [], 2
+        chunk.append(encoded)
+        size += len(encoded) + 1
+    if chunk or not counter[0]:
+        yield b"[" + b",".join(chunk) + b"]"
+
+def _text_chunks(text: str, chunk_bytes: int):
+    """Split text into UTF-8 slices of at most chunk_bytes, never inside a character."""
+    data = text.encode("utf-8")
+    if not data:
+        yield data
+        return
+    chunk_bytes = max(chunk_bytes, 4)
+    start = 0
+    while start < len(data):
+        end = min(len(data), start + chunk_bytes)
+        # back off to a character boundary (continuation bytes are 0b10xxxxxx)
+        while end < len(data) and data[end] & 0xC0 == 0x80:
+            end -= 1
+        yield data[start:end]
+        start = end
+
+
+class ResultStore:
+    """Spooled results on disk: <id>.data holds the chunks back to back,
+    <id>.json their byte offsets and metadata."""
+
+    def __init__(self, directory: str = RESULT_DIR, chunk_bytes: int = CHUNK_BYTES,
+                 ttl: float = RESULT_TTL, inline_bytes: int = INLINE_RESULT_BYTES):
+        self.directory = directory
+        self.chunk_bytes = chunk_bytes
+        self.ttl = ttl
+        self.inline_bytes = inline_bytes
+        self._lock = threading.Lock()
+
+    def _paths(self, handle: str) -> tuple[str, str]:
+        if not handle.startswith(HANDLE_PREFIX):
+            raise ResultNotFound(handle)
+        result_id = handle[len(HANDLE_PREFIX):]
+        if not result_id.isalnum():
+            raise ResultNotFound(handle)
+        base = os.path.join(self.directory, result_id)
+        return base + ".json", base + ".data"
+
+    def put(self, tool: str, value) -> dict:
+        """Spool value and return its handle description.
+
+        Lists, tuples and iterators are stored as items; an iterator is
+        consumed as it is written, so its items never have to be in memory at once.
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        self.purge_expired()
+        handle = HANDLE_PREFIX + uuid.uuid4().hex
+        meta_path, data_path = self._paths(handle)
+        count = [0]
+        if isinstance(value, (list, tuple, Iterator)):
+            kind, chunks = "items", _item_chunks(value, self.chunk_bytes, count)
+        else:
+            kind, chunks = "text", _text_chunks(_text(value), self.chunk_bytes)
+        offsets = [0]
+        with open(data_path, "wb") as f:
+            for chunk in chunks:
+                f.write(chunk)
+                offsets.append(offsets[-1] + len(chunk))
+        info = {
+            "handle": handle,
+            "tool": tool,
+            "kind": kind,
+            "bytes": offsets[-1],
+            "chunks": len(offsets) - 1,
+            "items": count[0] if kind == "items" else None,
+            "expires_at": time.time() + self.ttl,
+        }
+        with open(meta_path, "w") as f:
+            json.dump({**info, "offsets": offsets}, f)
+        return info
+
+    def _meta(self, handle: str) -> dict:
+        meta_path, _ = self._paths(handle)
+        try:
+            with open(meta_path) as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            raise ResultNotFound(handle) from None
+        if meta["expires_at"] <= time.time():
+            self.delete(handle)
+            raise ResultNotFound(handle)
+        return meta
+
+    def info(self, handle: str) -> dict:
+        """Handle description of a spooled result, as returned by put()."""
+        meta = self._meta(handle)
+        del meta["offsets"]
+        return meta
+
+    def read(self, handle: str, chunk: int = 0) -> dict:
+        """Chunk number chunk of a spooled result: {"handle", "chunk", "chunks", "data"}."""
+        meta = self._meta(handle)
+        if not 0 <= chunk < meta["chunks"]:
+            raise IndexError(f"chunk must be in 0..{meta['chunks'] - 1}")
+        start, end = meta["offsets"][chunk], meta["offsets"][chunk + 1]
+        with open(self._paths(handle)[1], "rb") as f:
+            f.seek(start)
+            data = f.read(end - start)
+        return {
+            "handle": handle,
+            "chunk": chunk,
+            "chunks": meta["chunks"],
+            "data": json.loads(data) if meta["kind"] == "items" else data.decode("utf-8"),
+        }
+
+    def copy_to(self, handle: str, f) -> str:
+        """Write the whole spooled result to the binary file f, one chunk at a time.
+
+        Text results are written as-is, item results as one JSON list.
+        Returns the result's kind ("text" or "items").
+        """
+        meta = self._meta(handle)
+        offsets = meta["offsets"]
+        with open(self._paths(handle)[1], "rb") as data:
+            if meta["kind"] == "items":
+                f.write(b"[")
+            for chunk in range(meta["chunks"]):
+                data_chunk = data.read(offsets[chunk + 1] - offsets[chunk])
+                if meta["kind"] == "items":
+                    # each chunk is a JSON list: drop its brackets and join the items with commas
+                    data_chunk = data_chunk[1:-1]
+                    if chunk and data_chunk:
+                        f.write(b",")
+                f.write(data_chunk)
+            if meta["kind"] == "items":
+                f.write(b"]")
+        return meta["kind"]
+
+    def delete(self, handle: str) -> None:
+        for path in self._paths(handle):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+    def purge_expired(self) -> int:
+        """Delete expired results; returns how many were removed."""
+        removed = 0
+        now = time.time()
+        with self._lock:
+            try:
+                names = os.listdir(self.directory)
+            except FileNotFoundError:
+                return 0
+            for name in names:
+                if not name.endswith(".json"):
+                    continue
+                handle = HANDLE_PREFIX + name[:-len(".json")]
+                try:
+                    with open(os.path.join(self.directory, name)) as f:
+                        expires_at = json.load(f)["expires_at"]
+                except (OSError, ValueError, KeyError):
+                    continue
+                if expires_at <= now:
+                    self.delete(handle)
+                    removed += 1
+        return removed
+
+
+store = ResultStore()
@@ -6,6 +6,7 @@ import asyncio
 from google import genai
 from concurrent.futures import TimeoutError
 from functools import partial
+import client_codec
 
 # Load environment variables from .env file
 load_dotenv()
@@ -157,10 +158,17 @@ You must respond with EXACTLY ONE line in one of these formats (no additional te
 Important:
 - When a function returns multiple values (like arrays), you need to process all of them
 - When passing arrays as parameters, use comma-separated values: value1,value2,value3
+- Packed array results ({{"dtype", "shape", "data"}}) can be passed unchanged to any array parameter: use the JSON given after "use:"
+- To run several independent math operations at once, use batch_eval with a JSON list of {{"op", "args"}} objects
+- To chain math steps in one call, use evaluate_expression, e.g. sum(exp(ord_list("INDIA")))
+- If a result is a handle like {{"handle": "result://...", "chunks": n}}, read it with read_result|handle|chunk for chunk 0..n-1
+- send_email queues the email and returns a queue id; get_send_status|queue_id reports whether it was sent
+- To attach files or large results, add a fifth send_email parameter with comma-separated file paths or result handles
+- To email several recipients at once, use send_emails_batch with a JSON list of {{"recipient", "subject", "body"}} objects (messages it reports as queued get a queue id for get_send_status)
 - After calculating the final answer, you MUST:
   1. Visualize it in Paint using this sequence:
-     * First call: open_paint_and_select_rectangle|rect_tool_x|rect_tool_y (e.g., open_paint_and_select_rectangle|530|85)
-       - This opens Paint, maximizes it, and clicks the rectangle tool
+     * First call: open_paint_and_select_rectangle (no parameters)
+       - This opens Paint, maximizes it, and finds and clicks the rectangle tool on screen
        - CALL THIS ONLY ONCE
      * Second call: draw_rectangle|x1|y1|x2|y2 (e.g., draw_rectangle|250|250|1702|922)
        - This draws the rectangle by clicking and dragging from (x1,y1) to (x2,y2)
@@ -174,7 +182,9 @@ Important:
 Examples:
 - FUNCTION_CALL: strings_to_chars_to_int|INDIA
 - FUNCTION_CALL: int_list_to_exponential_sum|73,78,68,73,65
-- FUNCTION_CALL: open_paint_and_select_rectangle|530|85
+- FUNCTION_CALL: evaluate_expression|sum(exp(ord_list("INDIA")))
+- FUNCTION_CALL: batch_eval|[{{"op": "add", "args": [2, 3]}}, {{"op": "factorial", "args": [5]}}]
+- FUNCTION_CALL: open_paint_and_select_rectangle
 - FUNCTION_CALL: draw_rectangle|250|250|1702|922
 - FUNCTION_CALL: add_text_in_paint|FINAL_ANSWER: [42]
 - FUNCTION_CALL: send_email|{RECIPIENT_EMAIL}|Calculation Complete|Final answer: 42
@@ -252,34 +262,17 @@ Your entire response should be a single line starting with FUNCTION_CALL:"""
                             # Prepare arguments
                             arguments = {}
                             schema_properties = tool.inputSchema.get('properties', {})
+                            required_params = tool.inputSchema.get('required', [])
                             
                             for param_name, param_info in schema_properties.items():
                                 if not params:
+                                    if param_name not in required_params:
+                                        continue  # optional parameter left at its default
                                     raise ValueError(f"Not enough parameters for {func_name}")
                                 
                                 value = params.pop(0)
-                                param_type = param_info.get('type', 'string')
-                                
-                                # Convert to correct type
-                                if param_type == 'integer':
-                                    arguments[param_name] = int(value)
-                                elif param_type == 'number':
-                                    arguments[param_name] = float(value)
-                                elif param_type == 'array':
-                                    if isinstance(value, str):
-                                        value = value.strip('[]').replace(' ', '')
-                                        value_list = value.split(',')
-                                        try:
-                                            arguments[param_name] = [int(x) for x in value_list if x]
-                                        except ValueError:
-                                            try:
-                                                arguments[param_name] = [float(x) for x in value_list if x]
-                                            except ValueError:
-                                                arguments[param_name] = [x for x in value_list if x]
-                                    else:
-                                        arguments[param_name] = value
-                                else:
-                                    arguments[param_name] = str(value)
+                                # Convert to correct type (lists, packed arrays, numbers, strings)
+                                arguments[param_name] = client_codec.coerce_argument(value, param_info)
                             
                             print(f">>> Calling: {func_name}({arguments})")
                             
@@ -298,14 +291,17 @@ Your entire response should be a single line starting with FUNCTION_CALL:"""
                             
                             # Get the full result content
                             iteration_result = ""
+                            reusable_texts = []
                             if hasattr(result, 'content'):
                                 if isinstance(result.content, list):
                                     iteration_result_list = []
                                     for item in result.content:
                                         if hasattr(item, 'text'):
-                                            iteration_result_list.append(item.text)
+                                            iteration_result_list.append(client_codec.decode_result_text(item.text))
+                                            reusable_texts.append(client_codec.reusable_text(item.text))
                                         else:
                                             iteration_result_list.append(str(item))
+                                            reusable_texts.append(str(item))
                                     iteration_result = iteration_result_list
                                 else:
                                     iteration_result = str(result.content)
@@ -314,8 +310,9 @@ Your entire response should be a single line starting with FUNCTION_CALL:"""
                             
                             # Format response
                             if isinstance(iteration_result, list):
-                                result_str = ','.join(str(x) for x in iteration_result)
-                                result_display = f"[{result_str}]"
+                                # show packed arrays decoded, but have the model pass them on packed
+                                result_display = f"[{','.join(client_codec.format_result_item(x) for x in iteration_result)}]"
+                                result_str = ','.join(reusable_texts)
                             else:
                                 result_str = str(iteration_result)
                                 result_display = result_str
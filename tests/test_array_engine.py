@@ -0,0 +1,32 @@
+# Overflowing exponential sums and reductions of huge integers
+
+from decimal import Decimal, localcontext
+
+import pytest
+
+import array_engine
+
+
+def expected_mantissa(peak: float, count: int = 1) -> tuple[float, int]:
+    with localcontext(prec=400):
+        log10 = (Decimal(peak) + Decimal(count).ln()) / Decimal(10).ln()
+        exponent = int(log10)
+        return float(Decimal(10) ** (log10 - exponent)), exponent
+
+@pytest.mark.parametrize("peak", [1e7, 1e16, 1e17, 1e18, 3.5e200])
+@pytest.mark.parametrize("count", [1, 2])
+def test_exponential_sum_mantissa_of_huge_peaks(peak, count):
+    result = array_engine.exponential_sum([peak] * count)
+    mantissa, exponent = expected_mantissa(peak, count)
+    assert result["exponent"] == exponent
+    assert result["mantissa"] == pytest.approx(mantissa, rel=1e-12)
+
+def test_mean_and_var_of_ints_beyond_float_range():
+    big = 10 ** 400
+    assert array_engine.reduce_array("mean", [big, -big, 3, 5]) == 2.0
+    assert array_engine.reduce_array("var", [big + 1, big + 3]) == 1.0
+    with pytest.raises(ValueError, match="too large for a float"):
+        array_engine.reduce_array("mean", [big, big])
+
+def test_mean_of_ints_beyond_int64_is_exact():
+    assert array_engine.reduce_array("mean", [2 ** 64 + 1, 2 ** 64 + 3]) == float(2 ** 64 + 2)
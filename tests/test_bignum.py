@@ -0,0 +1,20 @@
+# Approximate digits / leading output of large factorials
+
+import math
+import time
+
+import pytest
+
+import bignum
+
+
+@pytest.mark.parametrize("n", [171, 500, 1000, 4567, 20000])
+@pytest.mark.parametrize("output", ["digits", "leading"])
+def test_factorial_estimate_matches_exact(n, output):
+    assert bignum.factorial(n, output) == bignum.render(math.factorial(n), output)
+
+def test_large_factorial_digits_without_computing_it():
+    start = time.perf_counter()
+    assert bignum.factorial(10 ** 6, "digits") == 5565709
+    assert bignum.factorial(10 ** 6, "leading") == "8.26393168833124006237664610317e+5565708"
+    assert time.perf_counter() - start < 1
@@ -0,0 +1,34 @@
+# Arithmetic in compiled expressions
+
+import pytest
+
+import bignum
+from expression_compiler import ExpressionError, compile_expression
+
+FUNCTIONS = {"power": bignum.power}
+
+
+def evaluate(source: str):
+    return compile_expression(source, FUNCTIONS)()["result"]
+
+
+@pytest.mark.parametrize("source, expected", [
+    ("2 ** 10", 1024),
+    ("2 ** 0.5", 2 ** 0.5),
+    ("2 ** -1", 0.5),
+    ("2.5 ** 2", 6.25),
+    ("power(10, 3) * 7", 7000),
+])
+def test_arithmetic(source, expected):
+    assert evaluate(source) == pytest.approx(expected)
+
+@pytest.mark.parametrize("source", ["(-8) ** (1 / 3)", "10.0 ** 400", "1e308 * 10", '"x" * 3', "[0] * 3"])
+def test_rejects_non_real_or_non_numeric(source):
+    with pytest.raises(ExpressionError):
+        evaluate(source)
+
+@pytest.mark.parametrize("source", ["10 ** 5000", "power(10, 3000) ** 2", "a = power(10, 4000); a * a",
+                                    "a = 10 ** 3000; b = a * a; b * b"])
+def test_integer_results_are_size_checked(source):
+    with pytest.raises(bignum.ResultTooLarge):
+        evaluate(source)
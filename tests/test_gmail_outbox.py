@@ -0,0 +1,55 @@
+# Outbox claims when several processes share one outbox file
+
+import multiprocessing
+import time
+
+import gmail_outbox
+
+
+def _claim_all(path: str, results) -> None:
+    outbox = gmail_outbox.Outbox(path)
+    claimed = []
+    while (row := outbox.claim()) is not None:
+        claimed.append(row["id"])
+    results.put(claimed)
+    outbox.close()
+
+
+def test_second_outbox_leaves_a_message_being_sent_alone(tmp_path):
+    path = str(tmp_path / "outbox.sqlite3")
+    first = gmail_outbox.Outbox(path)
+    queue_id = first.enqueue("to@example.com", "subject", "body")
+    assert first.claim()["id"] == queue_id
+
+    second = gmail_outbox.Outbox(path)
+    assert second.status(queue_id)["status"] == "sending"
+    assert second.claim() is None
+
+def test_abandoned_send_is_claimed_after_the_lease(tmp_path):
+    path = str(tmp_path / "outbox.sqlite3")
+    first = gmail_outbox.Outbox(path, lease=0.05)
+    queue_id = first.enqueue("to@example.com", "subject", "body")
+    first.claim()
+    first.close()
+
+    second = gmail_outbox.Outbox(path, lease=0.05)
+    time.sleep(0.1)
+    row = second.claim()
+    assert row["id"] == queue_id
+    assert second.status(queue_id)["attempts"] == 2
+    assert second.claim() is None
+
+def test_concurrent_processes_claim_each_message_once(tmp_path):
+    path = str(tmp_path / "outbox.sqlite3")
+    outbox = gmail_outbox.Outbox(path)
+    ids = [outbox.enqueue(f"to{i}@example.com", "subject", "body") for i in range(200)]
+
+    context = multiprocessing.get_context("spawn")
+    results = context.Queue()
+    workers = [context.Process(target=_claim_all, args=(path, results)) for _ in range(3)]
+    for worker in workers:
+        worker.start()
+    claimed = [queue_id for _ in workers for queue_id in results.get(timeout=60)]
+    for worker in workers:
+        worker.join()
+    assert sorted(claimed) == ids
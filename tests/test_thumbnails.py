@@ -0,0 +1,41 @@
+# Least-recently-used eviction of the on-disk thumbnail cache
+
+import os
+
+import thumbnails
+from thumbnails import DiskCache
+
+
+def test_evicts_least_recently_used(tmp_path):
+    cache = DiskCache(str(tmp_path), max_bytes=30)
+    for key in "abc":
+        cache.put(key, key.encode() * 10)
+    assert cache.get("a") == b"a" * 10
+    cache.put("d", b"d" * 10)
+    assert cache.get("b") is None
+    assert [cache.get(key) is not None for key in "acd"] == [True, True, True]
+    assert cache.stats()["bytes"] == 30
+    assert cache.evictions == 1
+
+def test_replacing_an_entry_keeps_the_total(tmp_path):
+    cache = DiskCache(str(tmp_path), max_bytes=100)
+    cache.put("a", b"x" * 10)
+    cache.put("a", b"y" * 25)
+    assert cache.stats()["bytes"] == 25
+    assert sum(entry.stat().st_size for entry in os.scandir(tmp_path)) == 25
+
+def test_scans_the_directory_once(tmp_path, monkeypatch):
+    for i, key in enumerate("abc"):
+        DiskCache(str(tmp_path), max_bytes=100).put(key, b"z" * 10)
+        path = os.path.join(tmp_path, DiskCache(str(tmp_path))._name(key))
+        os.utime(path, ns=(i * 10 ** 9, i * 10 ** 9))
+    scans = []
+    real_scandir = os.scandir
+    monkeypatch.setattr(thumbnails.os, "scandir", lambda path: scans.append(path) or real_scandir(path))
+    cache = DiskCache(str(tmp_path), max_bytes=25)
+    cache.put("d", b"d" * 5)
+    cache.put("e", b"e" * 5)
+    assert len(scans) == 1
+    # the oldest files on disk went first
+    assert cache.get("a") is None and cache.get("b") is None
+    assert cache.get("c") is not None
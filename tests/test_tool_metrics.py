@@ -0,0 +1,21 @@
+# Latency quantiles from the per-tool histogram
+
+import pytest
+
+from tool_metrics import ToolStats
+
+
+def stats_of(*latencies: float) -> ToolStats:
+    stats = ToolStats()
+    for seconds in latencies:
+        stats.record(seconds, False, 0, 0)
+    return stats
+
+def test_single_sample_quantiles_are_that_sample():
+    stats = stats_of(0.04)
+    assert [stats.quantile(q) for q in (0.5, 0.95, 0.99)] == [0.04, 0.04, 0.04]
+
+@pytest.mark.parametrize("q", [0.0, 0.1, 0.5, 0.9, 1.0])
+def test_quantiles_stay_within_observed_latencies(q):
+    stats = stats_of(0.03, 0.031, 0.032, 0.045, 0.07)
+    assert 0.03 <= stats.quantile(q) <= 0.07
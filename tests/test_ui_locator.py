@@ -0,0 +1,59 @@
+# Template matching on synthetic screenshots
+
+import numpy as np
+import pytest
+
+import ui_locator
+
+# Scales tried on mixed-DPI setups, in addition to the configured defaults
+MIXED_SCALES = (0.75, 1.0, 1.25, 1.5)
+
+# One position of every (x, y) parity, plus offsets that are odd modulo 4
+POSITIONS = [(300, 700), (301, 700), (300, 701), (301, 701), (5, 5), (303, 707), (450, 999)]
+
+
+def screenshot(seed: int = 0) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    return rng.random((1200, 1600)) * 255
+
+def paste(image: np.ndarray, template: np.ndarray, x: int, y: int) -> np.ndarray:
+    image = image.copy()
+    h, w = template.shape
+    image[y:y + h, x:x + w] = template
+    return image
+
+
+@pytest.mark.parametrize("size", [24, 48])
+@pytest.mark.parametrize("x, y", POSITIONS)
+def test_finds_template_at_every_parity(size, x, y):
+    image = screenshot()
+    template = image[y:y + size, x:x + size]
+    match = ui_locator.match_template(image, template)
+    assert match is not None
+    assert match["box"][:2] == [x, y]
+    assert match["score"] == pytest.approx(1.0)
+
+@pytest.mark.parametrize("scale", sorted(set(ui_locator.DEFAULT_SCALES) | set(MIXED_SCALES)))
+@pytest.mark.parametrize("x, y", POSITIONS[:4])
+def test_finds_scaled_template(scale, x, y):
+    template = screenshot(seed=1)[:24, :24]
+    image = paste(screenshot(), ui_locator.resize(template, scale), x, y)
+    scales = tuple(sorted(set(ui_locator.DEFAULT_SCALES) | {scale}))
+    match = ui_locator.match_template(image, template, scales)
+    assert match is not None
+    assert match["scale"] == scale
+    assert match["box"][:2] == [x, y]
+
+def test_missing_template_is_not_found():
+    image = screenshot()
+    template = screenshot(seed=2)[:24, :24]
+    assert ui_locator.match_template(image, template) is None
+
+def test_locator_reuses_cached_position(tmp_path):
+    image = screenshot()
+    template = image[701:725, 301:325]
+    locator = ui_locator.Locator(template_dir=str(tmp_path))
+    first = locator.locate(image, template)
+    second = locator.locate(image, template)
+    assert first["box"] == second["box"] == [301, 701, 325, 725]
+    assert (first["cached"], second["cached"]) == (False, True)
@@ -0,0 +1,304 @@
+# thumbnails.py - Thumbnail pipeline with draft decoding and memory + disk caches
+
+import asyncio
+import hashlib
+import io
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+
+from PIL import Image as PILImage, ImageOps
+
+import cpu_executor
+import tool_cache
+
+THUMBNAIL_FORMATS = ("png", "jpeg", "webp")
+
+DEFAULT_SIZE = 100
+
+# Largest thumbnail edge accepted, in pixels
+MAX_SIZE = 2048
+
+THUMBNAIL_DIR = os.getenv("MCP_THUMBNAIL_DIR", os.path.join(tempfile.gettempdir(), "mcp_thumbnails"))
+
+# Total size of encoded thumbnails kept in memory and on disk
+MEMORY_CACHE_BYTES = int(os.getenv("MCP_THUMBNAIL_MEMORY_BYTES", 32 * 1024 * 1024))
+DISK_CACHE_BYTES = int(os.getenv("MCP_THUMBNAIL_DISK_BYTES", 256 * 1024 * 1024))
+
+# Worker processes for batch thumbnailing (one per core by default)
+THUMBNAIL_WORKERS = int(os.getenv("MCP_THUMBNAIL_WORKERS", os.cpu_count() or 1))
+
+# Largest number of images accepted by one batch
+MAX_BATCH_FILES = 10_000
+
+# Seconds between progress notifications during a batch
+BATCH_PROGRESS_INTERVAL = 0.25
+
+
+def cache_key(path: str, width: int, height: int, fmt: str) -> str:
+    """(path, mtime, size, target dims, format) of the source file as a cache key.
+
+    A changed file gets a new mtime or size and so a new key; stale entries
+    simply age out of the LRU caches.
+    """
+    real_path = os.path.realpath(path)
+    st = os.stat(real_path)
+    return f"{real_path}|{st.st_mtime_ns}|{st.st_size}|{width}x{height}|{fmt}"
+
+def render(path: str, width: int, height: int, fmt: str) -> bytes:
+    """Decode path at reduced resolution and encode a thumbnail fitting width x height."""
+    with PILImage.open(path) as img:
+        # JPEG: let the decoder downscale by 1/2, 1/4 or 1/8 in the DCT; a no-op for other formats
+        img.draft("RGB", (width, height))
+        img = ImageOps.exif_transpose(img)
+        # reduce() by an integer factor first, then a Lanczos resample of the small image
+        img.thumbnail((width, height), PILImage.Resampling.LANCZOS, reducing_gap=2.0)
+        if fmt == "jpeg" and img.mode not in ("RGB", "L"):
+            img = img.convert("RGB")
+        elif img.mode not in ("RGB", "RGBA", "L", "LA", "P"):
+            img = img.convert("RGBA" if "A" in img.getbands() else "RGB")
+        out = io.BytesIO()
+        if fmt == "jpeg":
+            img.save(out, "JPEG", quality=85, optimize=True)
+        elif fmt == "webp":
+            img.save(out, "WEBP", quality=80, method=4)
+        else:
+            img.save(out, "PNG", optimize=True)
+        return out.getvalue()
+
+
+class DiskCache:
+    """Encoded thumbnails as files named by key hash, evicted least recently used first.
+
+    An in-memory index of file sizes in use order, with a running total, is
+    seeded once from a directory scan on first use; reads also refresh a
+    file's mtime so the order survives a restart.
+    """
+
+    def __init__(self, directory: str = THUMBNAIL_DIR, max_bytes: int = DISK_CACHE_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._index: OrderedDict[str, int] | None = None
+        self._bytes = None
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _name(self, key: str) -> str:
+        return hashlib.sha256(key.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> bytes | None:
+        name = self._name(key)
+        path = os.path.join(self.directory, name)
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+            os.utime(path)
+        except OSError:
+            with self._lock:
+                self.misses += 1
+                if self._index is not None and name in self._index:
+                    self._bytes -= self._index.pop(name)
+            return None
+        with self._lock:
+            self.hits += 1
+            if self._index is not None:
+                if name not in self._index:
+                    self._bytes += len(data)
+                self._index[name] = len(data)
+                self._index.move_to_end(name)
+        return data
+
+    def put(self, key: str, data: bytes) -> None:
+        if len(data) > self.max_bytes:
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        name = self._name(key)
+        path = os.path.join(self.directory, name)
+        tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(data)
+        with self._lock:
+            if self._index is None:
+                self._load()
+            os.replace(tmp, path)
+            self._bytes += len(data) - self._index.pop(name, 0)
+            self._index[name] = len(data)
+            self._evict()
+
+    def _load(self) -> None:
+        """Index the files already on disk, oldest use first, statting each once."""
+        entries = []
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith(".tmp"):
+                continue
+            try:
+                if not entry.is_file():
+                    continue
+                st = entry.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((st.st_mtime_ns, entry.name, st.st_size))
+        entries.sort()
+        self._index = OrderedDict((name, size) for _, name, size in entries)
+        self._bytes = sum(self._index.values())
+
+    def _evict(self) -> None:
+        """Remove least recently used files until the cache is back under max_bytes."""
+        while self._bytes > self.max_bytes and self._index:
+            name, size = self._index.popitem(last=False)
+            try:
+                os.remove(os.path.join(self.directory, name))
+            except FileNotFoundError:
+                pass
+            self._bytes -= size
+            self.evictions += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+            }
+
+
+memory_cache = tool_cache.ToolCache("thumbnails", max_entries=4096, max_bytes=MEMORY_CACHE_BYTES)
+tool_cache.CACHES["thumbnails"] = memory_cache
+disk_cache = DiskCache()
+
+
+def normalize_format(fmt: str) -> str:
+    fmt = fmt.lower()
+    fmt = "jpeg" if fmt == "jpg" else fmt
+    if fmt not in THUMBNAIL_FORMATS:
+        raise ValueError(f"Unknown format: {fmt} (expected one of {', '.join(THUMBNAIL_FORMATS)})")
+    return fmt
+
+def check_size(size: int) -> None:
+    if not 1 <= size <= MAX_SIZE:
+        raise ValueError(f"size must be between 1 and {MAX_SIZE}")
+
+def lookup(key: str) -> bytes | None:
+    """Cached thumbnail for key from memory, else from disk (then kept in memory too)."""
+    data = memory_cache.get(key)
+    if data is not tool_cache.MISSING:
+        return data
+    data = disk_cache.get(key)
+    if data is not None:
+        memory_cache.put(key, data)
+    return data
+
+def store(key: str, data: bytes) -> None:
+    disk_cache.put(key, data)
+    memory_cache.put(key, data)
+
+def thumbnail(path: str, size: int = DEFAULT_SIZE, fmt: str = "png") -> bytes:
+    """Encoded thumbnail of the image at path fitting size x size, from cache when possible."""
+    fmt = normalize_format(fmt)
+    check_size(size)
+    key = cache_key(path, size, size, fmt)
+    data = lookup(key)
+    if data is None:
+        data = render(path, size, size, fmt)
+        store(key, data)
+    return data
+
+
+# ------------------------------------------------
+# BATCHES
+# ------------------------------------------------
+def image_extensions() -> set[str]:
+    """File extensions Pillow can open, e.g. ".jpg"."""
+    return {ext for ext, fmt in PILImage.registered_extensions().items() if fmt in PILImage.OPEN}
+
+def collect_paths(paths: str | list[str], recursive: bool = False) -> list[str]:
+    """Image files named by paths: files as given, directories expanded (sorted)."""
+    if isinstance(paths, str):
+        paths = [paths]
+    extensions = image_extensions()
+    found = []
+    for path in paths:
+        if not os.path.isdir(path):
+            found.append(path)
+            continue
+        for root, dirs, files in os.walk(path):
+            dirs.sort()
+            found.extend(os.path.join(root, name) for name in sorted(files)
+                         if os.path.splitext(name)[1].lower() in extensions)
+            if not recursive:
+                break
+        if len(found) > MAX_BATCH_FILES:
+            break
+    if len(found) > MAX_BATCH_FILES:
+        raise ValueError(f"Too many images: more than {MAX_BATCH_FILES:,} (pass a smaller directory or list)")
+    return found
+
+executor = cpu_executor.CpuExecutor(workers=THUMBNAIL_WORKERS)
+
+def _resolve_cached(items: list[dict], size: int, fmt: str) -> list[tuple[dict, str]]:
+    """Mark items that are cached or unreadable; (item, key) for those still to render."""
+    pending = []
+    for item in items:
+        try:
+            key = cache_key(item["path"], size, size, fmt)
+        except OSError as e:
+            item.update(status="error", error=f"{type(e).__name__}: {e}")
+            continue
+        data = lookup(key)
+        if data is not None:
+            item.update(status="cached", bytes=len(data))
+        else:
+            pending.append((item, key))
+    return pending
+
+async def thumbnail_many(paths: list[str], size: int = DEFAULT_SIZE, fmt: str = "png", progress=None) -> dict:
+    """Thumbnail every path, rendering uncached ones across the worker pool.
+
+    Returns {"total", "created", "cached", "failed", "items"}, one item
+    {"path", "status", "bytes" or "error"} per path in input order.
+    progress, if given, is an async progress(done, total, message) called
+    as files complete.
+    """
+    fmt = normalize_format(fmt)
+    check_size(size)
+    items = [{"path": path} for path in paths]
+    # stat and cache reads are blocking file I/O; keep them off the event loop
+    pending = await asyncio.to_thread(_resolve_cached, items, size, fmt)
+
+    loop = asyncio.get_running_loop()
+    done = len(items) - len(pending)
+    last_report = 0.0
+    # keep the pool busy without queueing every file's arguments at once
+    slots = asyncio.Semaphore(max(1, executor.workers) * 2)
+
+    async def render_one(item: dict, key: str) -> None:
+        nonlocal done, last_report
+        async with slots:
+            try:
+                data, _ = await executor.run(render, (item["path"], size, size, fmt))
+            except Exception as e:
+                item.update(status="error", error=f"{type(e).__name__}: {e}")
+            else:
+                await asyncio.to_thread(store, key, data)
+                item.update(status="created", bytes=len(data))
+        done += 1
+        if progress is not None and (loop.time() - last_report >= BATCH_PROGRESS_INTERVAL or done == len(items)):
+            last_report = loop.time()
+            await progress(done, len(items), f"{item['path']}: {item['status']}")
+
+    await asyncio.gather(*(render_one(item, key) for item, key in pending))
+    counts = {status: sum(item.get("status") == status for item in items) for status in ("created", "cached", "error")}
+    return {
+        "total": len(items),
+        "created": counts["created"],
+        "cached": counts["cached"],
+        "failed": counts["error"],
+        "items": items,
+    }
@@ -0,0 +1,150 @@
+# tool_cache.py - Memoization for pure (deterministic) MCP tools
+
+import functools
+import inspect
+import json
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+DEFAULT_MAX_ENTRIES = 1024
+DEFAULT_MAX_BYTES = 16 * 1024 * 1024
+
+# Every cache created by @pure keyed by tool name, plus other named result caches
+CACHES = {}
+
+MISSING = object()
+
+
+def estimate_size(value) -> int:
+    """Approximate in-memory size of a tool result in bytes."""
+    if isinstance(value, bool) or value is None:
+        return sys.getsizeof(value)
+    if isinstance(value, int):
+        return sys.getsizeof(0) + value.bit_length() // 8
+    if isinstance(value, (list, tuple)):
+        return sys.getsizeof(value) + sum(estimate_size(item) for item in value)
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(estimate_size(k) + estimate_size(v) for k, v in value.items())
+    nbytes = getattr(value, "nbytes", None)
+    if isinstance(nbytes, int):
+        return nbytes
+    return sys.getsizeof(value)
+
+
+class ToolCache:
+    """LRU of tool results bounded by entry count and total estimated bytes,
+    with an optional time-to-live per entry."""
+
+    def __init__(self, name: str, max_entries: int = DEFAULT_MAX_ENTRIES,
+                 max_bytes: int = DEFAULT_MAX_BYTES, ttl: float | None = None):
+        self.name = name
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._entries = OrderedDict()  # key -> (value, size, expires_at)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key: str):
+        """Cached value for key, or MISSING."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[2] is not None and entry[2] <= time.monotonic():
+                self._remove(key)
+                self.expirations += 1
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return MISSING
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key: str, value) -> None:
+        size = estimate_size(value)
+        if size > self.max_bytes:
+            return
+        expires_at = time.monotonic() + self.ttl if self.ttl is not None else None
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (value, size, expires_at)
+            self._bytes += size
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def _remove(self, key: str) -> None:
+        _, size, _ = self._entries.pop(key)
+        self._bytes -= size
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_entries": self.max_entries,
+                "max_bytes": self.max_bytes,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+            }
+
+
+def make_key(signature: inspect.Signature, args: tuple, kwargs: dict) -> str | None:
+    """Canonical key for a call: arguments bound by name, defaults applied,
+    serialized as sorted JSON. None if the arguments cannot be serialized."""
+    bound = signature.bind(*args, **kwargs)
+    bound.apply_defaults()
+    try:
+        return json.dumps(bound.arguments, sort_keys=True, separators=(",", ":"))
+    except (TypeError, ValueError):
+        return None
+
+def pure(max_entries: int = DEFAULT_MAX_ENTRIES, max_bytes: int = DEFAULT_MAX_BYTES,
+         ttl: float | None = None):
+    """Mark a tool as pure and memoize its results.
+
+    Place it below @mcp.tool() / @math_tool so the registered tool is the
+    cached one. Results are shared between callers and must not be mutated.
+    Exceptions are not cached. The cache is reachable as fn.cache.
+    """
+    def decorator(fn):
+        cache = ToolCache(fn.__name__, max_entries, max_bytes, ttl)
+        CACHES[fn.__name__] = cache
+        signature = inspect.signature(fn)
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            key = make_key(signature, args, kwargs)
+            if key is not None:
+                value = cache.get(key)
+                if value is not MISSING:
+                    return value
+            result = fn(*args, **kwargs)
+            if key is not None:
+                cache.put(key, result)
+            return result
+
+        wrapper.cache = cache
+        return wrapper
+    return decorator
+
+def stats() -> dict:
+    """Stats of every pure tool cache, keyed by tool name."""
+    return {name: cache.stats() for name, cache in CACHES.items()}
@@ -0,0 +1,46 @@
+# tool_hooks.py - Wrap the functions behind registered FastMCP tools
+
+import functools
+
+
+class ToolCall:
+    """One tool invocation as seen by an observer; result is set on success."""
+
+    def __init__(self, name: str, arguments: dict):
+        self.name = name
+        self.arguments = arguments
+        self.result = None
+
+
+def wrap_tools(server, observe, names=None) -> list[str]:
+    """Run every registered tool (or only those in names) inside observe.
+
+    observe(call: ToolCall) must return a context manager entered around the
+    tool function; call.result is filled in before it exits normally. Call
+    this after all tools are registered. Returns the wrapped tool names.
+    """
+    wrapped = []
+    for tool in server._tool_manager.list_tools():
+        if names is not None and tool.name not in names:
+            continue
+        tool.fn = _wrap(tool.name, tool.fn, tool.is_async, observe)
+        wrapped.append(tool.name)
+    return wrapped
+
+def _wrap(name: str, fn, is_async: bool, observe):
+    if is_async:
+        @functools.wraps(fn)
+        async def async_wrapper(*args, **kwargs):
+            call = ToolCall(name, kwargs)
+            with observe(call):
+                call.result = await fn(*args, **kwargs)
+            return call.result
+        return async_wrapper
+
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        call = ToolCall(name, kwargs)
+        with observe(call):
+            call.result = fn(*args, **kwargs)
+        return call.result
+    return wrapper
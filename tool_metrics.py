@@ -0,0 +1,196 @@
+# tool_metrics.py - Per-tool call counts, errors, latency histograms and payload sizes
+
+import atexit
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+import pydantic_core
+
+from tool_hooks import wrap_tools
+
+# Latency histogram bucket upper bounds, in seconds
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1,
+                   0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, float("inf"))
+
+# Write Prometheus text metrics to this file when the process exits
+PROMETHEUS_FILE = os.getenv("MCP_METRICS_PROM_FILE")
+
+
+def payload_bytes(value) -> int:
+    """Size of a tool argument or result once serialized for the wire."""
+    if value is None:
+        return 0
+    if isinstance(value, str):
+        return len(value.encode("utf-8"))
+    if isinstance(value, (bytes, bytearray)):
+        return len(value)
+    data = getattr(value, "data", None)
+    if isinstance(data, (bytes, bytearray)):
+        return len(data)
+    return len(pydantic_core.to_json(value, fallback=str))
+
+
+class ToolStats:
+    """Counters and a latency histogram for one tool."""
+
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.latency_sum = 0.0
+        self.latency_min = 0.0
+        self.latency_max = 0.0
+        self.buckets = [0] * len(LATENCY_BUCKETS)
+        self.input_bytes = 0
+        self.output_bytes = 0
+
+    def record(self, seconds: float, failed: bool, input_bytes: int, output_bytes: int) -> None:
+        self.calls += 1
+        self.errors += failed
+        self.latency_sum += seconds
+        self.latency_min = seconds if self.calls == 1 else min(self.latency_min, seconds)
+        self.latency_max = max(self.latency_max, seconds)
+        self.input_bytes += input_bytes
+        self.output_bytes += output_bytes
+        for i, bound in enumerate(LATENCY_BUCKETS):
+            if seconds <= bound:
+                self.buckets[i] += 1
+                break
+
+    def quantile(self, q: float) -> float:
+        """Latency quantile estimated by linear interpolation inside the histogram
+        bucket, with the bucket narrowed to the observed min and max latency."""
+        if self.calls == 0:
+            return 0.0
+        rank = q * self.calls
+        seen = 0
+        lower = 0.0
+        for bound, count in zip(LATENCY_BUCKETS, self.buckets):
+            if count and seen + count >= rank:
+                lower = max(lower, self.latency_min)
+                upper = min(bound, self.latency_max)
+                return lower + (upper - lower) * (rank - seen) / count
+            seen += count
+            lower = bound
+        return self.latency_max
+
+    def summary(self) -> dict:
+        return {
+            "calls": self.calls,
+            "errors": self.errors,
+            "latency_seconds": {
+                "p50": self.quantile(0.50),
+                "p95": self.quantile(0.95),
+                "p99": self.quantile(0.99),
+                "mean": self.latency_sum / self.calls if self.calls else 0.0,
+                "min": self.latency_min,
+                "max": self.latency_max,
+            },
+            "input_bytes": self.input_bytes,
+            "output_bytes": self.output_bytes,
+        }
+
+
+class ToolMetrics:
+    """Metrics registry for one MCP server."""
+
+    def __init__(self):
+        self._tools = {}
+        self._gauges = {}
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def observe(self, call):
+        start = time.perf_counter()
+        failed = True
+        try:
+            yield call
+            failed = False
+        finally:
+            elapsed = time.perf_counter() - start
+            input_size = payload_bytes(call.arguments)
+            output_size = 0 if failed else payload_bytes(call.result)
+            with self._lock:
+                stats = self._tools.setdefault(call.name, ToolStats())
+                stats.record(elapsed, failed, input_size, output_size)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {name: stats.summary() for name, stats in sorted(self._tools.items())}
+
+    def register_gauge(self, name: str, read) -> None:
+        """Report read(), a current value such as a queue depth, as the gauge name."""
+        with self._lock:
+            self._gauges[name] = read
+
+    def gauges(self) -> dict:
+        """Current value of every registered gauge (None if reading it failed)."""
+        with self._lock:
+            gauges = sorted(self._gauges.items())
+        values = {}
+        for name, read in gauges:
+            try:
+                values[name] = read()
+            except Exception:
+                values[name] = None
+        return values
+
+    def prometheus_text(self) -> str:
+        """All metrics in the Prometheus text exposition format."""
+        lines = [
+            "# TYPE mcp_tool_calls_total counter",
+            "# TYPE mcp_tool_errors_total counter",
+            "# TYPE mcp_tool_input_bytes_total counter",
+            "# TYPE mcp_tool_output_bytes_total counter",
+            "# TYPE mcp_tool_latency_seconds histogram",
+        ]
+        with self._lock:
+            for name, stats in sorted(self._tools.items()):
+                label = f'tool="{name}"'
+                lines.append(f"mcp_tool_calls_total{{{label}}} {stats.calls}")
+                lines.append(f"mcp_tool_errors_total{{{label}}} {stats.errors}")
+                lines.append(f"mcp_tool_input_bytes_total{{{label}}} {stats.input_bytes}")
+                lines.append(f"mcp_tool_output_bytes_total{{{label}}} {stats.output_bytes}")
+                cumulative = 0
+                for bound, count in zip(LATENCY_BUCKETS, stats.buckets):
+                    cumulative += count
+                    le = "+Inf" if bound == float("inf") else repr(bound)
+                    lines.append(f'mcp_tool_latency_seconds_bucket{{{label},le="{le}"}} {cumulative}')
+                lines.append(f"mcp_tool_latency_seconds_sum{{{label}}} {stats.latency_sum}")
+                lines.append(f"mcp_tool_latency_seconds_count{{{label}}} {stats.calls}")
+        for name, value in self.gauges().items():
+            if value is not None:
+                lines.append(f"# TYPE {name} gauge")
+                lines.append(f"{name} {value}")
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self, path: str) -> None:
+        with open(path, "w") as f:
+            f.write(self.prometheus_text())
+
+
+def instrument(server, prometheus_file: str | None = PROMETHEUS_FILE) -> ToolMetrics:
+    """Collect metrics for every tool registered on server so far.
+
+    Serves them as JSON from the metrics://tools resource (gauges added
+    with register_gauge from metrics://gauges) and, if prometheus_file is
+    set, writes them in Prometheus text format at exit.
+    """
+    metrics = ToolMetrics()
+    wrap_tools(server, metrics.observe)
+
+    @server.resource("metrics://tools")
+    def get_tool_metrics() -> str:
+        """Per-tool call counts, error counts, latency percentiles and payload sizes."""
+        return json.dumps(metrics.snapshot(), indent=2)
+
+    @server.resource("metrics://gauges")
+    def get_gauges() -> str:
+        """Current values of registered gauges, e.g. queue depths."""
+        return json.dumps(metrics.gauges(), indent=2)
+
+    if prometheus_file:
+        atexit.register(metrics.write_prometheus, prometheus_file)
+    return metrics
@@ -0,0 +1,206 @@
+# tool_profiler.py - Opt-in per-call profiling of selected MCP tools
+#
+# Enable with MCP_PROFILE_TOOLS=factorial,create_thumbnail (or "*" for every
+# tool), or by starting the server with --profile=factorial,create_thumbnail.
+# Each profiled call writes a cProfile file (open it with pstats or snakeviz)
+# and the slowest calls are listed in slowest.json in the profile directory.
+# Work a profiled call hands to a CPU worker process (see cpu_executor) is
+# profiled in that worker and listed under the call's worker_profiles.
+
+import contextvars
+import cProfile
+import itertools
+import json
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager, nullcontext
+
+from tool_hooks import wrap_tools
+
+PROFILE_TOOLS = os.getenv("MCP_PROFILE_TOOLS", "")
+PROFILE_DIR = os.getenv("MCP_PROFILE_DIR", "profiles")
+
+# Number of calls kept in the slowest-calls index
+PROFILE_KEEP = int(os.getenv("MCP_PROFILE_KEEP", "50"))
+
+INDEX_FILE = "slowest.json"
+
+
+def selected_tools(argv: list[str] | None = None, env: str = PROFILE_TOOLS) -> set[str] | None:
+    """Tool names to profile from --profile=... in argv or MCP_PROFILE_TOOLS.
+
+    Returns None when profiling is off and {"*"} for every tool.
+    """
+    argv = sys.argv[1:] if argv is None else argv
+    spec = env
+    for arg in argv:
+        if arg.startswith("--profile="):
+            spec = arg.split("=", 1)[1]
+    names = {name.strip() for name in spec.split(",") if name.strip()}
+    return names or None
+
+
+class WorkerProfiles:
+    """Profiles written by worker processes on behalf of one profiled call."""
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self.entries = []
+
+
+# The WorkerProfiles of the profiled call running in this context, if any
+_worker_profiles = contextvars.ContextVar("worker_profiles", default=None)
+
+# Profile file sequence numbers in this process
+_seq = itertools.count(1)
+
+
+def worker_profiles() -> WorkerProfiles | None:
+    """Where work the current tool call runs in another process should be profiled, or None."""
+    return _worker_profiles.get()
+
+def _profile_filename(name: str, started_at: float) -> str:
+    stamp = time.strftime("%Y%m%dT%H%M%S", time.localtime(started_at))
+    return f"{stamp}-{os.getpid()}-{next(_seq):06d}-{name}.prof"
+
+@contextmanager
+def _profiled(stats: dict):
+    """Run the block under cProfile and tracemalloc; yields the profiler and
+    fills stats with the block's allocated and peak allocated bytes."""
+    started_tracing = not tracemalloc.is_tracing()
+    if started_tracing:
+        tracemalloc.start()
+    tracemalloc.reset_peak()
+    allocated_before = tracemalloc.get_traced_memory()[0]
+    profiler = cProfile.Profile()
+    try:
+        profiler.enable()
+        try:
+            yield profiler
+        finally:
+            profiler.disable()
+    finally:
+        allocated_after, peak = tracemalloc.get_traced_memory()
+        if started_tracing:
+            tracemalloc.stop()
+        stats["allocated_bytes"] = allocated_after - allocated_before
+        stats["peak_allocated_bytes"] = peak - allocated_before
+
+def run_profiled(fn, args: tuple, kwargs: dict, directory: str) -> tuple:
+    """Call fn(*args, **kwargs) profiled, writing its profile to directory.
+
+    Runs in a CPU worker process. Returns (result, entry), entry being the
+    profile file name with the call's pid, duration and allocations.
+    """
+    stats = {}
+    started_at = time.time()
+    start = time.perf_counter()
+    with _profiled(stats) as profiler:
+        result = fn(*args, **kwargs)
+    seconds = time.perf_counter() - start
+    filename = _profile_filename(fn.__name__, started_at)
+    profiler.dump_stats(os.path.join(directory, filename))
+    return result, {"function": fn.__name__, "pid": os.getpid(), "seconds": seconds, "profile": filename, **stats}
+
+
+class ToolProfiler:
+    """Profiles tool calls and keeps an index of the slowest ones on disk."""
+
+    def __init__(self, directory: str = PROFILE_DIR, keep: int = PROFILE_KEEP):
+        self.directory = directory
+        self.keep = keep
+        self._slowest = []
+        self._lock = threading.Lock()
+        # cProfile and tracemalloc are process-wide; calls that overlap a
+        # profiled call are timed but not profiled.
+        self._active = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+        self._load_index()
+
+    def _load_index(self) -> None:
+        try:
+            with open(os.path.join(self.directory, INDEX_FILE)) as f:
+                self._slowest = json.load(f)[:self.keep]
+        except (OSError, ValueError):
+            self._slowest = []
+
+    @contextmanager
+    def observe(self, call):
+        profiling = self._active.acquire(blocking=False)
+        stats = {}
+        workers = WorkerProfiles(self.directory) if profiling else None
+        token = _worker_profiles.set(workers)
+        started_at = time.time()
+        start = time.perf_counter()
+        error = None
+        profiler = None
+        try:
+            with _profiled(stats) if profiling else nullcontext() as profiler:
+                yield call
+        except BaseException as e:
+            error = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            _worker_profiles.reset(token)
+            seconds = time.perf_counter() - start
+            entry = {
+                "tool": call.name,
+                "seconds": seconds,
+                "started_at": started_at,
+                "error": error,
+                "profile": None,
+            }
+            if profiling:
+                entry.update(stats)
+                if workers.entries:
+                    entry["worker_profiles"] = workers.entries
+                try:
+                    entry["profile"] = self._dump(call.name, started_at, profiler)
+                finally:
+                    self._active.release()
+            self._record(entry)
+
+    def _dump(self, name: str, started_at: float, profiler: cProfile.Profile) -> str:
+        filename = _profile_filename(name, started_at)
+        profiler.dump_stats(os.path.join(self.directory, filename))
+        return filename
+
+    def _record(self, entry: dict) -> None:
+        with self._lock:
+            if len(self._slowest) >= self.keep and entry["seconds"] <= self._slowest[-1]["seconds"]:
+                return
+            self._slowest.append(entry)
+            self._slowest.sort(key=lambda e: e["seconds"], reverse=True)
+            del self._slowest[self.keep:]
+            path = os.path.join(self.directory, INDEX_FILE)
+            with open(path + ".tmp", "w") as f:
+                json.dump(self._slowest, f, indent=2)
+            os.replace(path + ".tmp", path)
+
+    def slowest(self) -> list[dict]:
+        with self._lock:
+            return list(self._slowest)
+
+
+def instrument(server, tools: set[str] | None = None, directory: str = PROFILE_DIR,
+               keep: int = PROFILE_KEEP) -> ToolProfiler | None:
+    """Profile calls to the selected tools (default: from argv/environment).
+
+    Returns None, wrapping nothing, when no tools are selected. Otherwise the
+    slowest calls are also served from the profiles://slowest resource.
+    """
+    tools = selected_tools() if tools is None else tools
+    if not tools:
+        return None
+    profiler = ToolProfiler(directory, keep)
+    wrap_tools(server, profiler.observe, None if "*" in tools else tools)
+
+    @server.resource("profiles://slowest")
+    def get_slowest_calls() -> str:
+        """The slowest profiled tool calls with their profile file names."""
+        return json.dumps(profiler.slowest(), indent=2)
+
+    return profiler
@@ -0,0 +1,277 @@
+# ui_locator.py - Find UI elements in a screenshot by template matching
+#
+# Normalized cross-correlation (NCC) computed with NumPy FFTs: the
+# correlation with the zero-mean template is one FFT product, and the
+# per-window image energy comes from summed-area tables, so a full
+# screenshot is scored in a few FFTs. The search runs coarse-to-fine on
+# 2x image pyramids, scoring the coarse level for every pixel phase of the
+# template, and can try several template scales (other DPI / resolution
+# settings). Located positions are cached by screen size and template hash
+# and re-verified with a single-window NCC before reuse.
+
+import hashlib
+import json
+import os
+import threading
+
+import numpy as np
+
+# Minimum NCC score (-1..1) accepted as a match
+MIN_SCORE = 0.8
+
+# Template scales tried by default, e.g. "0.75,1,1.25,1.5" for mixed DPI setups
+DEFAULT_SCALES = tuple(float(s) for s in os.getenv("MCP_UI_SCALES", "1.0").split(","))
+
+# The coarse pyramid level keeps the template at least this many pixels on its short side
+MIN_COARSE_TEMPLATE = 8
+
+# Candidates from the coarse level refined at full resolution
+COARSE_CANDIDATES = 5
+
+# Directory of named templates (<name>.png) and optional JSON file persisting located positions
+TEMPLATE_DIR = os.getenv("MCP_UI_TEMPLATE_DIR", "ui_templates")
+CACHE_FILE = os.getenv("MCP_UI_LOCATOR_CACHE")
+
+
+def to_gray(image) -> np.ndarray:
+    """A PIL image or array as a float64 grayscale array."""
+    if hasattr(image, "convert"):
+        image = image.convert("L")
+    array = np.asarray(image, dtype=np.float64)
+    if array.ndim == 3:
+        # ITU-R 601 luma, as Pillow's "L" conversion
+        array = array[..., :3] @ np.array([0.299, 0.587, 0.114])
+    return array
+
+def downsample(array: np.ndarray) -> np.ndarray:
+    """Half-resolution array by averaging 2x2 blocks (odd edges are dropped)."""
+    h, w = array.shape[0] // 2 * 2, array.shape[1] // 2 * 2
+    return array[:h, :w].reshape(h // 2, 2, w // 2, 2).mean(axis=(1, 3))
+
+def resize(array: np.ndarray, scale: float) -> np.ndarray:
+    """array rescaled by scale with bilinear interpolation."""
+    if scale == 1.0:
+        return array
+    from PIL import Image
+
+    h, w = array.shape
+    size = (max(1, round(w * scale)), max(1, round(h * scale)))
+    return np.asarray(Image.fromarray(array.astype(np.float32), mode="F").resize(size, Image.Resampling.BILINEAR),
+                      dtype=np.float64)
+
+def _window_sums(array: np.ndarray, h: int, w: int) -> np.ndarray:
+    """Sum of every h x w window (valid positions only) from a summed-area table."""
+    table = np.zeros((array.shape[0] + 1, array.shape[1] + 1))
+    table[1:, 1:] = array.cumsum(axis=0).cumsum(axis=1)
+    return table[h:, w:] - table[:-h, w:] - table[h:, :-w] + table[:-h, :-w]
+
+def ncc_map(image: np.ndarray, template: np.ndarray) -> np.ndarray:
+    """NCC score of template at every valid top-left position in image.
+
+    The result has shape (H - h + 1, W - w + 1); flat windows score 0.
+    """
+    H, W = image.shape
+    h, w = template.shape
+    if h > H or w > W:
+        return np.zeros((0, 0))
+    t = template - template.mean()
+    t_norm = np.sqrt((t * t).sum())
+    if t_norm == 0:
+        return np.zeros((H - h + 1, W - w + 1))
+    # circular cross-correlation; positions that do not wrap are exactly the valid ones
+    product = np.fft.rfft2(image) * np.conj(np.fft.rfft2(t, s=(H, W)))
+    numerator = np.fft.irfft2(product, s=(H, W))[:H - h + 1, :W - w + 1]
+    sums = _window_sums(image, h, w)
+    energy = _window_sums(image * image, h, w) - sums * sums / (h * w)
+    denominator = np.sqrt(np.maximum(energy, 0)) * t_norm
+    scores = np.zeros_like(numerator)
+    np.divide(numerator, denominator, out=scores, where=denominator > 1e-6 * t_norm)
+    return np.clip(scores, -1.0, 1.0)
+
+def score_at(image: np.ndarray, template: np.ndarray, top: int, left: int) -> float:
+    """NCC score of template with the single window at (top, left)."""
+    h, w = template.shape
+    if top < 0 or left < 0 or top + h > image.shape[0] or left + w > image.shape[1]:
+        return -1.0
+    window = image[top:top + h, left:left + w]
+    a, b = window - window.mean(), template - template.mean()
+    denominator = np.sqrt((a * a).sum() * (b * b).sum())
+    return float((a * b).sum() / denominator) if denominator > 0 else 0.0
+
+def _peaks(scores: np.ndarray, count: int, radius: int) -> list[tuple[int, int]]:
+    """Up to count highest positions, suppressing a radius around each one taken."""
+    scores = scores.copy()
+    peaks = []
+    for _ in range(count):
+        index = np.argmax(scores)
+        top, left = np.unravel_index(index, scores.shape)
+        if scores[top, left] <= -1.0:
+            break
+        peaks.append((int(top), int(left)))
+        scores[max(0, top - radius):top + radius + 1, max(0, left - radius):left + radius + 1] = -1.0
+    return peaks
+
+def _match_scale(image: np.ndarray, template: np.ndarray) -> tuple[float, int, int]:
+    """Best (score, top, left) of one template size, searched coarse-to-fine."""
+    h, w = template.shape
+    levels = 0
+    while min(h, w) >> (levels + 1) >= MIN_COARSE_TEMPLATE and min(image.shape) >> (levels + 1) >= 1:
+        levels += 1
+    if levels == 0:
+        scores = ncc_map(image, template)
+        if scores.size == 0:
+            return -1.0, 0, 0
+        top, left = np.unravel_index(np.argmax(scores), scores.shape)
+        return float(scores[top, left]), int(top), int(left)
+
+    coarse_image = image
+    for _ in range(levels):
+        coarse_image = downsample(coarse_image)
+    factor = 1 << levels
+    # The template is downsampled on its own grid; a match at an offset that is not a
+    # multiple of factor lines up with the image grid only for the template shifted by
+    # that phase, so the coarse search runs once per phase.
+    candidates = []
+    for dy in range(factor):
+        for dx in range(factor):
+            coarse_template = template[dy:, dx:]
+            for _ in range(levels):
+                coarse_template = downsample(coarse_template)
+            scores = ncc_map(coarse_image, coarse_template)
+            if scores.size == 0:
+                continue
+            for top, left in _peaks(scores, COARSE_CANDIDATES, max(1, min(coarse_template.shape) // 2)):
+                candidates.append((scores[top, left], top * factor - dy, left * factor - dx))
+    candidates.sort(reverse=True)
+    margin = 2 * factor
+    best = (-1.0, 0, 0)
+    for _, top, left in candidates[:COARSE_CANDIDATES]:
+        # refine at full resolution in a small window around the coarse hit
+        y0, x0 = max(0, top - margin), max(0, left - margin)
+        y1, x1 = min(image.shape[0], top + h + margin), min(image.shape[1], left + w + margin)
+        fine = ncc_map(image[y0:y1, x0:x1], template)
+        if fine.size == 0:
+            continue
+        dy, dx = np.unravel_index(np.argmax(fine), fine.shape)
+        if fine[dy, dx] > best[0]:
+            best = (float(fine[dy, dx]), int(y0 + dy), int(x0 + dx))
+    return best
+
+def match_template(image, template, scales=DEFAULT_SCALES, min_score: float = MIN_SCORE) -> dict | None:
+    """Locate template in image (PIL images or arrays).
+
+    Returns {"x", "y", "score", "scale", "box"} with (x, y) the center of the
+    best match and box [left, top, right, bottom], or None if no scale
+    scores at least min_score.
+    """
+    image, template = to_gray(image), to_gray(template)
+    best = None
+    for scale in scales:
+        scaled = resize(template, scale)
+        score, top, left = _match_scale(image, scaled)
+        if best is None or score > best["score"]:
+            h, w = scaled.shape
+            best = {
+                "x": left + w // 2,
+                "y": top + h // 2,
+                "score": score,
+                "scale": scale,
+                "box": [left, top, left + w, top + h],
+            }
+    if best is None or best["score"] < min_score:
+        return None
+    return best
+
+
+class Locator:
+    """Template matching with a cache of located positions.
+
+    Entries are keyed by screen size, template hash and scales. A cached
+    position is reused only if the template still matches there, which costs
+    one window's NCC instead of a full search.
+    """
+
+    def __init__(self, template_dir: str = TEMPLATE_DIR, cache_file: str | None = CACHE_FILE):
+        self.template_dir = template_dir
+        self.cache_file = cache_file
+        self._cache = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        if cache_file:
+            try:
+                with open(cache_file) as f:
+                    self._cache = json.load(f)
+            except (OSError, ValueError):
+                self._cache = {}
+
+    def template_path(self, name: str) -> str:
+        """Path of a named template, or name itself if it is a path."""
+        if os.path.sep in name or name.lower().endswith(".png"):
+            return name
+        return os.path.join(self.template_dir, f"{name}.png")
+
+    def save_template(self, screenshot, box: tuple[int, int, int, int], name: str) -> str:
+        """Save the box (left, top, right, bottom) of screenshot, a PIL image, as template name.
+
+        Returns the template's path; the ui_templates directory is created if needed.
+        """
+        path = self.template_path(name)
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        screenshot.crop(box).save(path, format="PNG")
+        return path
+
+    def load_template(self, name: str) -> np.ndarray:
+        from PIL import Image
+
+        with Image.open(self.template_path(name)) as template:
+            return to_gray(template)
+
+    def locate(self, screenshot, template, scales=DEFAULT_SCALES, min_score: float = MIN_SCORE) -> dict | None:
+        """Find template (a name, path, PIL image or array) in screenshot."""
+        if isinstance(template, str):
+            template = self.load_template(template)
+        image, template = to_gray(screenshot), to_gray(template)
+        key = "|".join([
+            f"{image.shape[1]}x{image.shape[0]}",
+            hashlib.sha1(np.ascontiguousarray(template, dtype=np.float32).tobytes()).hexdigest(),
+            f"{template.shape[1]}x{template.shape[0]}",
+            ",".join(map(str, scales)),
+        ])
+        with self._lock:
+            cached = self._cache.get(key)
+        if cached is not None:
+            left, top = cached["box"][0], cached["box"][1]
+            score = score_at(image, resize(template, cached["scale"]), top, left)
+            if score >= min_score:
+                self.hits += 1
+                return {**cached, "score": score, "cached": True}
+        self.misses += 1
+        match = match_template(image, template, scales, min_score)
+        if match is not None:
+            with self._lock:
+                self._cache[key] = match
+                self._save()
+        return match and {**match, "cached": False}
+
+    def _save(self) -> None:
+        if not self.cache_file:
+            return
+        tmp = self.cache_file + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(self._cache, f)
+        os.replace(tmp, self.cache_file)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._cache),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+
+locator = Locator()